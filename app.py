@@ -1,20 +1,126 @@
 import os
+import re
 import json
+import click
+import hashlib
+import time
 from datetime import datetime, timedelta
+from functools import wraps
 from io import BytesIO
-from flask import Flask, render_template, request, jsonify, send_file
-from models import db, Category, Person, Task, Note
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.enums import TA_CENTER
+from flask import (Flask, Response, render_template, request, jsonify, send_file,
+                   stream_with_context, make_response)
+from sqlalchemy.exc import IntegrityError, StatementError
+from models import (db, Category, Person, Task, Note, Tombstone, ArchivedTask, ArchivedNote,
+                    upsert_insert,
+                    current_revision, next_revision, row_dicts, row_select)
+from database import init_database
+from json_provider import init_json
+from compression import init_compression
+from metrics import init_metrics
+from profiler import init_profiler, profile_as_text
+from migrations import migrate_db
+from events import board_events
+from pdf_cache import PdfCache
+from pdf_jobs import PdfJobQueue
+from archive import archive_cutoff, archive_done_tasks
+from search import fts_query, rebuild_search_index, search, search_available
+from ordering import order_scope, next_order, move_row, schedule_rebalance
+from backup import (BACKUP_TABLES, stream_backup, gzip_stream, iter_backup, restore_rows,
+                    restore_progress, RestoreError)
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///ops.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+app.config['NOTES_PAGE_SIZE'] = 2000
+# /tasks embeds the board and the first notes so the board paints without API calls
+app.config['BOARD_BOOTSTRAP'] = os.environ.get('BOARD_BOOTSTRAP', '1') == '1'
+app.config['PDF_CACHE_MAX_BYTES'] = 32 * 1024 * 1024
+app.config['PDF_CACHE_MAX_ENTRIES'] = 64
+app.config['PDF_CACHE_DIR'] = os.environ.get('PDF_CACHE_DIR')  # memory only when unset
+app.config['PDF_JOB_WORKERS'] = 2
+app.config['PDF_JOB_TTL'] = 600  # seconds a finished export job is kept
+app.config['PDF_JOB_EXECUTOR'] = os.environ.get('PDF_JOB_EXECUTOR', 'thread')  # or 'process'
+app.config['PDF_BATCH_WORKERS'] = int(os.environ.get('PDF_BATCH_WORKERS', min(4, os.cpu_count() or 1)))
+app.config['PDF_BATCH_MAX_WEEKS'] = 26
+app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 30))
+app.config['ARCHIVE_PAGE_SIZE'] = 200
+app.config['SEARCH_PAGE_SIZE'] = 20
+app.config['SEARCH_MAX_PAGE_SIZE'] = 100
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+app.config['METRICS_SLOW_REQUEST_MS'] = float(os.environ.get('METRICS_SLOW_REQUEST_MS', 500))
+app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED') == '1'
+app.config['PROFILER_DIR'] = os.path.join(app.instance_path, 'profiles')
+app.config['PROFILER_MAX_PROFILES'] = 20
+# Live updates over /api/stream hold a worker for each open board: keep them
+# off on small pools of sync workers
+app.config['EVENT_STREAM_ENABLED'] = os.environ.get('EVENT_STREAM_ENABLED') == '1'
+app.config['EVENT_STREAM_KEEPALIVE'] = 15  # seconds between SSE heartbeats
+app.config['EVENT_STREAM_LIFETIME'] = 25  # seconds before a stream ends and the client reconnects
+app.config['COMPRESS_MIN_SIZE'] = 1024  # bytes; smaller bodies go out as-is
+app.config['COMPRESS_GZIP_LEVEL'] = 6
+app.config['COMPRESS_BROTLI_LEVEL'] = 5  # static files are precompressed at 11
+app.config['COMPRESS_STATIC_DIR'] = os.path.join(app.instance_path, 'static_compressed')
+init_database(app)
+init_json(app)
+init_metrics(app, db)  # before compression: its after_request runs last and sees wire sizes
+init_compression(app)
+profile_store = init_profiler(app)
+pdf_cache = PdfCache.from_config(app.config)
+pdf_jobs = PdfJobQueue.from_config(app.config)
+
+
+def default_week_start():
+    """The board week starts on the last Friday (today included)."""
+    today = datetime.now()
+    diff = (today.weekday() + 2) % 7
+    return today - timedelta(days=diff)
+
+
+def page_limit(default, maximum):
+    """The `limit` query argument, clamped to 1..maximum."""
+    return max(1, min(request.args.get('limit', default, type=int), maximum))
+
+
+def keyset_after():
+    """The `after` cursor ("YYYY-MM-DD:id", from X-Next-After) as (date, id), or None.
+
+    Raises ValueError when the cursor is malformed.
+    """
+    after = request.args.get('after')
+    if not after:
+        return None
+    after_date, after_id = after.rsplit(':', 1)
+    datetime.strptime(after_date, '%Y-%m-%d')
+    return after_date, int(after_id)
+
+
+def revision_etag(daily=False):
+    """Conditional GET for a read endpoint, keyed on the board revision.
+
+    Every write bumps BoardState.rev, so the revision plus the endpoint and
+    its query string identifies the response body without building it: a
+    matching If-None-Match gets an empty 304 before the view runs. The
+    comparison is weak so the W/ tag of a compressed body matches too. Pass
+    daily=True when the body also depends on today's date (default ranges).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            rev, _ = current_revision()
+            parts = [request.endpoint, str(rev)]
+            parts += [f"{k}={v}" for k, v in sorted(request.args.items(multi=True))]
+            if daily:
+                parts.append(datetime.now().strftime('%Y-%m-%d'))
+            etag = hashlib.sha1('\n'.join(parts).encode()).hexdigest()[:20] + f"-{rev}"
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'  # always revalidate
+            return response
+        return wrapped
+    return decorator
 
 @app.route('/')
 def home():
@@ -26,49 +132,253 @@ def landing():
 
 @app.route('/tasks')
 def app_main():
-    return render_template('index.html')
+    live = app.config['EVENT_STREAM_ENABLED']
+    if not app.config['BOARD_BOOTSTRAP']:
+        return render_template('index.html', live_updates=live)
+    response = make_response(render_template('index.html', bootstrap=board_bootstrap(),
+                                             live_updates=live))
+    # The page carries board data now: always revalidate, never show a stale copy
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def board_bootstrap():
+    """
+    What script.js would fetch first, for embedding in the page.
+
+    The /api/init snapshot plus the notes of the calendar weeks (Monday
+    based, as the client pages them) under its first four-day window. When
+    those exceed a notes page they are left out and the client fetches them.
+    """
+    data = init_snapshot()
+    today = datetime.now()
+    weeks = sorted({(day - timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+                    for day in (today, today + timedelta(days=3))})
+    end = (datetime.strptime(weeks[-1], '%Y-%m-%d') + timedelta(days=6)).strftime('%Y-%m-%d')
+    limit = app.config['NOTES_PAGE_SIZE']
+    notes = row_dicts(Note, stmt=row_select(Note).where(Note.date >= weeks[0], Note.date <= end)
+                      .order_by(Note.date, Note.id).limit(limit + 1))
+    if len(notes) > limit:
+        weeks, notes = [], []
+    data['note_weeks'] = weeks
+    data['notes'] = notes
+    return data
 
 # --- API: INIT ---
 @app.route('/api/init', methods=['GET'])
+@revision_etag()
 def get_init_data():
-    # Return hierarchical data for the matrix
-    categories = Category.query.order_by(Category.order).all()
-    people = Person.query.all()
-    
-    # We want tasks grouped by category
-    cats_data = []
-    for cat in categories:
-        c_dict = cat.to_dict()
-        # Tasks are already ordered by 'order' due to relationship definition
-        c_dict['tasks'] = [t.to_dict() for t in cat.tasks]
-        cats_data.append(c_dict)
-        
-    return jsonify({
+    return jsonify(init_snapshot())
+
+def init_snapshot():
+    # Return hierarchical data for the matrix.
+    # Three queries total (categories, tasks, people) whatever the board size:
+    # tasks are fetched in one pass and grouped in Python instead of lazy-loading
+    # cat.tasks once per category.
+    # The revision is read first so that a client syncing from it afterwards
+    # can only see changes twice, never miss one.
+    rev, _ = current_revision()
+    # Rows come back as plain tuples (models.row_dicts), never as ORM objects.
+    cats_data = row_dicts(Category, order_by=(Category.order, Category.id))
+    tasks = row_dicts(Task, order_by=(Task.category_id, Task.order, Task.id))
+    people = row_dicts(Person)
+
+    tasks_by_category = {}
+    for t in tasks:
+        tasks_by_category.setdefault(t['category_id'], []).append(t)
+    for c_dict in cats_data:
+        c_dict['tasks'] = tasks_by_category.get(c_dict['id'], [])
+
+    return {
+        'rev': rev,
         'categories': cats_data,
-        'people': [p.to_dict() for p in people]
-    })
+        'people': people
+    }
+
+# --- API: CHANGES ---
+def changes_since(since):
+    """Everything that changed after revision `since` as a JSON-ready dict."""
+    rev, reset_rev = current_revision()
+    if since < reset_rev or since > rev:
+        # Board was replaced (restore) or the client is ahead of us: full reload
+        return {'rev': rev, 'reset': True}
+
+    deleted = {'category': [], 'person': [], 'task': [], 'note': []}
+    for tomb in Tombstone.query.filter(Tombstone.rev > since, Tombstone.rev <= rev):
+        deleted[tomb.entity].append(tomb.entity_id)
+
+    def changed(model):
+        return row_dicts(model, model.rev > since, model.rev <= rev, order_by=(model.id,))
+
+    return {
+        'rev': rev,
+        'reset': False,
+        'categories': changed(Category),
+        'people': changed(Person),
+        'tasks': changed(Task),
+        'notes': changed(Note),
+        'deleted': deleted
+    }
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    # Everything that changed after revision `since`, so clients can patch
+    # their local copy instead of reloading /api/init and /api/notes.
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'error': 'since is required'}), 400
+    return jsonify(changes_since(since))
+
+@app.route('/api/stream', methods=['GET'])
+def stream_changes():
+    # Server-sent events as a long poll: the response ends after one `changes`
+    # event (same body as /api/changes) for the commits after `since`, or
+    # after EVENT_STREAM_LIFETIME seconds without any, and EventSource
+    # reconnects with Last-Event-ID. A sync worker is never held for longer.
+    if not app.config['EVENT_STREAM_ENABLED']:
+        return jsonify({'error': 'Live updates are disabled'}), 404
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'error': 'since is required'}), 400
+    keepalive = app.config['EVENT_STREAM_KEEPALIVE']
+
+    lifetime = app.config['EVENT_STREAM_LIFETIME']
+
+    def events():
+        deadline = time.monotonic() + lifetime
+        yield "retry: 1000\n\n"
+        while True:
+            seq = board_events.seq
+            rev, _ = current_revision()
+            if rev != since:
+                data = changes_since(since)
+                yield f"id: {data['rev']}\nevent: changes\ndata: {app.json.dumps(data)}\n\n"
+                return
+            # Don't hold a pooled connection while idle
+            db.session.rollback()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not board_events.wait(seq, min(keepalive, remaining)) and time.monotonic() < deadline:
+                yield ": keepalive\n\n"
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: don't buffer the stream
+    return response
+
+# --- Mutations ---
+# Shared by the single-row routes below and by /api/batch. They only touch
+# the session; the caller decides when to commit.
+
+def add_category(data):
+    # Append after the last category (MAX served by ix_category_order)
+    cat = Category(name=data['name'], color=data['color'], order=next_order(Category, order_scope(Category)))
+    db.session.add(cat)
+    db.session.flush()
+    return cat
+
+def change_category(cat, data):
+    if 'name' in data: cat.name = data['name']
+    if 'color' in data: cat.color = data['color']
+    if 'order' in data: cat.order = data['order']
+    return cat
+
+def add_person(data):
+    person = Person(name=data['name'])
+    db.session.add(person)
+    db.session.flush()
+    return person
+
+def remove_person(person):
+    # Unassign explicitly (rather than letting the flush null the FK) so the
+    # affected tasks get a new revision and show up in /api/changes
+    for task in person.tasks:
+        task.person_id = None
+    db.session.delete(person)
+
+def add_task(data):
+    # Append within the category (MAX served by ix_task_category_order)
+    task = Task(
+        category_id=data['category_id'],
+        text=data['text'],
+        person_id=data.get('person_id'),
+        order=next_order(Task, order_scope(Task, data['category_id']))
+    )
+    db.session.add(task)
+    db.session.flush()
+    return task
+
+def change_task(task, data):
+    if 'text' in data: task.text = data['text']
+    if 'done' in data: task.done = data['done']
+    if 'person_id' in data: task.person_id = data['person_id']
+    if 'order' in data: task.order = data['order']
+    if 'category_id' in data: task.category_id = data['category_id']
+    return task
+
+def move(model, row, data):
+    """
+    Reposition row right before data['before_id'] or right after
+    data['after_id'] (at the end when neither is given). Only row is
+    written; tasks may also change category via data['category_id'].
+    Returns True when the row's scope needs a rebalance, which the caller
+    schedules once the move is committed (the rebalance reads and writes
+    the scope in its own session).
+    """
+    before = db.session.get(model, data['before_id']) if data.get('before_id') else None
+    after = db.session.get(model, data['after_id']) if data.get('after_id') else None
+    if (data.get('before_id') and before is None) or (data.get('after_id') and after is None):
+        raise LookupError('Neighbour not found')
+
+    category_id = None
+    if model is Task:
+        neighbour = before or after
+        category_id = data.get('category_id') or (neighbour.category_id if neighbour else row.category_id)
+        if neighbour is not None and neighbour.category_id != category_id:
+            raise ValueError('Neighbour is in another category')
+        row.category_id = category_id
+
+    return move_row(model, row, order_scope(model, category_id), before, after)
+
+def save_note(data):
+    # Single INSERT ... ON CONFLICT statement against the (task_id, date)
+    # unique index: no read-then-write race, no duplicate rows.
+    # Core statements bypass the ORM flush hook, so stamp the revision here.
+    try:
+        task_id = int(data['task_id'])
+    except (TypeError, ValueError):
+        raise ValueError(f"task_id must be an integer, not {data['task_id']!r}")
+    stmt = upsert_insert(Note).values(
+        task_id=task_id,
+        date=data['date'],
+        content=data['content'],
+        rev=next_revision()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Note.task_id, Note.date],
+        set_={'content': stmt.excluded.content, 'rev': stmt.excluded.rev}
+    ).returning(Note.id, Note.task_id, Note.date, Note.content)
+    return dict(db.session.execute(stmt).mappings().one())
 
 # --- API: CATEGORIES ---
 @app.route('/api/categories', methods=['POST'])
 def create_category():
-    data = request.json
-    # Auto-increment order
-    max_order = db.session.query(db.func.max(Category.order)).scalar() or 0
-    new_cat = Category(name=data['name'], color=data['color'], order=max_order + 1)
-    db.session.add(new_cat)
+    new_cat = add_category(request.json)
     db.session.commit()
     return jsonify(new_cat.to_dict()), 201
 
 @app.route('/api/categories/<int:id>', methods=['PUT'])
 def update_category(id):
-    cat = Category.query.get_or_404(id)
-    data = request.json
-    if 'name' in data: cat.name = data['name']
-    if 'color' in data: cat.color = data['color']
-    if 'order' in data: cat.order = data['order']
+    cat = change_category(Category.query.get_or_404(id), request.json)
     db.session.commit()
     return jsonify(cat.to_dict())
 
+@app.route('/api/categories/<int:id>/move', methods=['POST'])
+def move_category(id):
+    return _move(Category, Category.query.get_or_404(id))
+
 @app.route('/api/categories/<int:id>', methods=['DELETE'])
 def delete_category(id):
     cat = Category.query.get_or_404(id)
@@ -78,53 +388,50 @@ def delete_category(id):
 
 # --- API: PEOPLE ---
 @app.route('/api/people', methods=['GET'])
+@revision_etag()
 def get_people():
-    people = Person.query.all()
-    return jsonify([p.to_dict() for p in people])
+    return jsonify(row_dicts(Person))
 
 @app.route('/api/people', methods=['POST'])
 def create_person():
-    data = request.json
-    new_person = Person(name=data['name'])
-    db.session.add(new_person)
+    new_person = add_person(request.json)
     db.session.commit()
     return jsonify(new_person.to_dict()), 201
 
 @app.route('/api/people/<int:id>', methods=['DELETE'])
 def delete_person(id):
-    person = Person.query.get_or_404(id)
-    db.session.delete(person)
+    remove_person(Person.query.get_or_404(id))
     db.session.commit()
     return jsonify({'success': True})
 
 # --- API: TASKS ---
 @app.route('/api/tasks', methods=['POST'])
 def create_task():
-    data = request.json
-    # Auto-increment order within category
-    max_order = db.session.query(db.func.max(Task.order)).filter_by(category_id=data['category_id']).scalar() or 0
-    
-    new_task = Task(
-        category_id=data['category_id'],
-        text=data['text'],
-        person_id=data.get('person_id'),
-        order=max_order + 1
-    )
-    db.session.add(new_task)
+    new_task = add_task(request.json)
     db.session.commit()
     return jsonify(new_task.to_dict()), 201
 
 @app.route('/api/tasks/<int:id>', methods=['PUT'])
 def update_task(id):
-    task = Task.query.get_or_404(id)
-    data = request.json
-    if 'text' in data: task.text = data['text']
-    if 'done' in data: task.done = data['done']
-    if 'person_id' in data: task.person_id = data['person_id']
-    if 'order' in data: task.order = data['order']
+    task = change_task(Task.query.get_or_404(id), request.json)
     db.session.commit()
     return jsonify(task.to_dict())
 
+@app.route('/api/tasks/<int:id>/move', methods=['POST'])
+def move_task(id):
+    return _move(Task, Task.query.get_or_404(id))
+
+def _move(model, row):
+    try:
+        needs_rebalance = move(model, row, request.get_json(silent=True) or {})
+    except (LookupError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    db.session.commit()
+    if needs_rebalance:
+        schedule_rebalance(app, model, row.category_id if model is Task else None)
+    return jsonify(row.to_dict())
+
 @app.route('/api/tasks/<int:id>', methods=['DELETE'])
 def delete_task(id):
     task = Task.query.get_or_404(id)
@@ -132,264 +439,558 @@ def delete_task(id):
     db.session.commit()
     return jsonify({'success': True})
 
+# --- API: BATCH ---
+BATCH_MODELS = {'category': Category, 'person': Person, 'task': Task}
+BATCH_CREATE = {'category': add_category, 'person': add_person, 'task': add_task}
+BATCH_UPDATE = {'category': change_category, 'task': change_task}
+BATCH_DELETE = {'category': db.session.delete, 'person': remove_person, 'task': db.session.delete}
+
+BATCH_REF_FIELDS = ('category_id', 'person_id', 'task_id')
+
+class BatchError(Exception):
+    pass
+
+def _resolve_ref(value, refs):
+    # "$name" points at the id of an earlier create with "ref": "name"
+    if isinstance(value, str) and value.startswith('$'):
+        if value[1:] not in refs:
+            raise BatchError(f'Unknown reference {value}')
+        return refs[value[1:]]
+    return value
+
+def _resolve_refs(data, refs):
+    # Only id fields take references; text starting with "$" is left alone
+    return {key: _resolve_ref(value, refs) if key in BATCH_REF_FIELDS else value
+            for key, value in data.items()}
+
+def _apply_operation(op, refs):
+    kind, action = op.get('type'), op.get('op')
+    data = _resolve_refs(op.get('data') or {}, refs)
+
+    if kind == 'note':
+        if action != 'upsert':
+            raise BatchError('notes only support op "upsert"')
+        return save_note(data)
+
+    handlers = {'create': BATCH_CREATE, 'update': BATCH_UPDATE, 'delete': BATCH_DELETE}.get(action)
+    if handlers is None or kind not in handlers:
+        raise BatchError(f'Unsupported operation {action!r} on {kind!r}')
+    if action == 'create':
+        row = handlers[kind](data)
+        if op.get('ref'):
+            refs[op['ref']] = row.id
+        return row.to_dict()
+
+    row_id = _resolve_ref(op.get('id'), refs)
+    row = db.session.get(BATCH_MODELS[kind], row_id)
+    if row is None:
+        raise BatchError(f'{kind} {row_id} not found')
+    if action == 'update':
+        return handlers[kind](row, data).to_dict()
+    handlers[kind](row)
+    return {'id': row_id, 'deleted': True}
+
+@app.route('/api/batch', methods=['POST'])
+def apply_batch():
+    """
+    Apply a list of operations in one transaction (one commit).
+
+    Body: {"operations": [{"op": "create"|"update"|"delete", "type":
+    "category"|"person"|"task", "id": ..., "data": {...}, "ref": ...},
+    {"op": "upsert", "type": "note", "data": {...}}, ...]}. A create may name
+    itself with "ref" so later operations can use "$ref" as the "id" or as a
+    category_id / person_id / task_id value.
+    Either every operation is applied or none is.
+    """
+    operations = (request.get_json(silent=True) or {}).get('operations')
+    if not isinstance(operations, list):
+        return jsonify({'error': 'operations must be a list'}), 400
+
+    refs, results = {}, []
+    for index, op in enumerate(operations):
+        try:
+            results.append(_apply_operation(op, refs))
+        except (BatchError, AttributeError, KeyError, TypeError, ValueError, StatementError) as e:
+            # StatementError covers IntegrityError and values of the wrong type
+            db.session.rollback()
+            message = str(e.orig) if isinstance(e, StatementError) else str(e)
+            return jsonify({'error': message, 'index': index}), 400
+    db.session.commit()
+    return jsonify({'results': results, 'rev': current_revision()[0]})
+
 # --- API: NOTES ---
 @app.route('/api/notes', methods=['GET'])
+@revision_etag(daily=True)
 def get_notes():
-    # Return notes for a specific range
+    # Return notes for a date range, defaulting to the current board week.
+    # Results are paged in (date, id) order, which ix_note_date serves directly:
+    # pass the X-Next-After response header back as `after` for the next page.
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    
-    query = Note.query
-    if start_date and end_date:
-        query = query.filter(Note.date >= start_date, Note.date <= end_date)
-    
-    notes = query.all()
-    return jsonify([n.to_dict() for n in notes])
+    if not start_date and not end_date:
+        week_start = default_week_start()
+        start_date = week_start.strftime('%Y-%m-%d')
+        end_date = (week_start + timedelta(days=6)).strftime('%Y-%m-%d')
+    try:
+        after = keyset_after()
+    except ValueError:
+        return jsonify({'error': 'after must be an X-Next-After cursor (YYYY-MM-DD:id)'}), 400
+    limit = page_limit(app.config['NOTES_PAGE_SIZE'], app.config['NOTES_PAGE_SIZE'])
+
+    query = row_select(Note)
+    if after:
+        query = query.where(db.tuple_(Note.date, Note.id) > after)
+    if start_date:
+        query = query.where(Note.date >= start_date)
+    if end_date:
+        query = query.where(Note.date <= end_date)
+
+    notes = row_dicts(Note, stmt=query.order_by(Note.date, Note.id).limit(limit))
+    response = jsonify(notes)
+    if len(notes) == limit:
+        response.headers['X-Next-After'] = f"{notes[-1]['date']}:{notes[-1]['id']}"
+    return response
 
 @app.route('/api/notes', methods=['POST'])
 def upsert_note():
-    data = request.json
-    task_id = data['task_id']
-    date = data['date']
-    content = data['content']
-    
-    note = Note.query.filter_by(task_id=task_id, date=date).first()
-    if note:
-        note.content = content
-    else:
-        note = Note(task_id=task_id, date=date, content=content)
-        db.session.add(note)
-    
+    try:
+        note = save_note(request.get_json(silent=True) or {})
+    except KeyError as e:
+        return jsonify({'error': f'{e.args[0]} is required'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     db.session.commit()
-    return jsonify(note.to_dict())
+    return jsonify(note)
 
 # --- API: BACKUP / RESTORE ---
 @app.route('/api/backup', methods=['GET'])
+@revision_etag()
 def backup_db():
-    data = {
-        'categories': [c.to_dict() for c in Category.query.all()],
-        'people': [p.to_dict() for p in Person.query.all()],
-        'tasks': [t.to_dict() for t in Task.query.all()],
-        'notes': [n.to_dict() for n in Note.query.all()]
-    }
+    # ?stream=json|ndjson streams the tables with server-side cursors instead
+    # of building the whole document in memory; add &gzip=1 to compress it.
+    fmt = request.args.get('stream')
+    if fmt:
+        if fmt not in ('json', 'ndjson'):
+            return jsonify({'error': 'stream must be json or ndjson'}), 400
+        chunks = stream_backup(fmt)
+        filename = f"seb_ops_backup.{fmt}"
+        mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+        if request.args.get('gzip') == '1':
+            chunks = gzip_stream(chunks)
+            filename += '.gz'
+            mimetype = 'application/gzip'
+        response = Response(stream_with_context(chunks), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    data = {key: row_dicts(model) for key, model in BACKUP_TABLES}
     return jsonify(data)
 
 @app.route('/api/restore', methods=['POST'])
 def restore_db():
-    data = request.json
-    if not data:
-        return jsonify({'error': 'No data provided'}), 400
-        
+    # The body is parsed incrementally (json or ndjson, optionally gzipped)
+    # and inserted in batches; one transaction, so a bad file changes nothing.
+    fmt = request.args.get('format') or ('ndjson' if request.mimetype == 'application/x-ndjson' else 'json')
+    compressed = request.mimetype == 'application/gzip' or request.content_encoding == 'gzip'
+
+    restore_progress.start()
     try:
-        Note.query.delete()
-        Task.query.delete()
-        Person.query.delete()
-        Category.query.delete()
-        
-        for c_data in data.get('categories', []):
-            cat = Category(name=c_data['name'], color=c_data['color'], order=c_data.get('order', 0))
-            cat.id = c_data['id']
-            db.session.add(cat)
-            
-        for p_data in data.get('people', []):
-            p = Person(name=p_data['name'])
-            p.id = p_data['id']
-            db.session.add(p)
-            
-        for t_data in data.get('tasks', []):
-            t = Task(
-                category_id=t_data['category_id'],
-                person_id=t_data['person_id'],
-                text=t_data['text'],
-                done=t_data['done'],
-                order=t_data.get('order', 0)
-            )
-            t.id = t_data['id']
-            db.session.add(t)
-            
-        for n_data in data.get('notes', []):
-            n = Note(
-                task_id=n_data['task_id'],
-                date=n_data['date'],
-                content=n_data['content']
-            )
-            n.id = n_data['id']
-            db.session.add(n)
-            
+        counts = restore_rows(iter_backup(request.stream, fmt, compressed))
         db.session.commit()
-        return jsonify({'success': True})
+        restore_progress.finish()
+        return jsonify({'success': True, 'restored': counts})
+    except (RestoreError, OSError, EOFError) as e:
+        db.session.rollback()
+        restore_progress.finish(str(e))
+        return jsonify({'error': str(e)}), 400
+    except IntegrityError as e:
+        # Duplicate ids in the upload
+        db.session.rollback()
+        restore_progress.finish(str(e.orig))
+        return jsonify({'error': str(e.orig)}), 400
     except Exception as e:
         db.session.rollback()
+        restore_progress.finish(str(e))
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/restore/progress', methods=['GET'])
+def restore_progress_status():
+    return jsonify(restore_progress.snapshot())
+
+# --- API: SEARCH ---
+SEARCH_KINDS = {'all': ('task', 'note'), 'tasks': ('task',), 'notes': ('note',)}
+
+@app.route('/api/search', methods=['GET'])
+@revision_etag()
+def search_board():
+    # Ranked full-text hits over task text and note content. `q` is free
+    # text (see search.fts_query), `type` is all|tasks|notes; pages with
+    # limit/offset, X-Next-Offset is set while more hits may follow.
+    # Snippets wrap matches in <mark></mark>; the rest is raw user text.
+    if not search_available(db.session.get_bind()):
+        return jsonify({'error': 'Search requires SQLite FTS5'}), 501
+    query = fts_query(request.args.get('q'))
+    if query is None:
+        return jsonify({'error': 'q is required'}), 400
+    kinds = SEARCH_KINDS.get(request.args.get('type', 'all'))
+    if kinds is None:
+        return jsonify({'error': 'type must be all, tasks or notes'}), 400
+    limit = page_limit(app.config['SEARCH_PAGE_SIZE'], app.config['SEARCH_MAX_PAGE_SIZE'])
+    offset = max(request.args.get('offset', 0, type=int), 0)
+
+    hits = search(db.session, query, kinds, limit=limit, offset=offset)
+    response = jsonify(hits)
+    if len(hits) == limit:
+        response.headers['X-Next-Offset'] = str(offset + limit)
+    return response
+
+@app.cli.command('search-index')
+def search_index_command():
+    """Rebuild the full-text search index from the task and note tables."""
+    with db.engine.begin() as conn:
+        if not rebuild_search_index(conn):
+            raise click.ClickException('Full-text search needs SQLite with FTS5')
+    click.echo('Search index rebuilt')
+
+# --- API: ARCHIVE ---
+@app.route('/api/archive', methods=['GET'])
+@revision_etag()
+def get_archive():
+    # Archived tasks, most recently done first. Filters: q (text contains),
+    # category_id, person_id, done_since / done_until (YYYY-MM-DD); notes=1
+    # attaches each task's notes. Paged like /api/notes via X-Next-After.
+    try:
+        after = keyset_after()
+    except ValueError:
+        return jsonify({'error': 'after must be an X-Next-After cursor (YYYY-MM-DD:id)'}), 400
+    limit = page_limit(app.config['ARCHIVE_PAGE_SIZE'], app.config['ARCHIVE_PAGE_SIZE'])
+    query = row_select(ArchivedTask)
+    if request.args.get('q'):
+        query = query.where(ArchivedTask.text.contains(request.args['q'], autoescape=True))
+    for arg in ('category_id', 'person_id'):
+        value = request.args.get(arg, type=int)
+        if value is not None:
+            query = query.where(getattr(ArchivedTask, arg) == value)
+    if request.args.get('done_since'):
+        query = query.where(ArchivedTask.done_on >= request.args['done_since'])
+    if request.args.get('done_until'):
+        query = query.where(ArchivedTask.done_on <= request.args['done_until'])
+    if after:
+        query = query.where(db.tuple_(ArchivedTask.done_on, ArchivedTask.id) < after)
+
+    tasks = row_dicts(ArchivedTask, stmt=query.order_by(
+        ArchivedTask.done_on.desc(), ArchivedTask.id.desc()).limit(limit))
+    if request.args.get('notes') == '1' and tasks:
+        notes_by_task = {}
+        for note in row_dicts(ArchivedNote, ArchivedNote.archived_task_id.in_([t['id'] for t in tasks]),
+                              order_by=(ArchivedNote.date, ArchivedNote.id)):
+            notes_by_task.setdefault(note['archived_task_id'], []).append(note)
+        for t in tasks:
+            t['notes'] = notes_by_task.get(t['id'], [])
+
+    response = jsonify(tasks)
+    if len(tasks) == limit:
+        response.headers['X-Next-After'] = f"{tasks[-1]['done_on']}:{tasks[-1]['id']}"
+    return response
+
+@app.route('/api/archive/run', methods=['POST'])
+def run_archive():
+    # Archive now instead of waiting for the scheduled `flask archive`.
+    days = (request.get_json(silent=True) or {}).get('days', app.config['ARCHIVE_AFTER_DAYS'])
+    if isinstance(days, bool) or not isinstance(days, int) or days < 0:
+        return jsonify({'error': 'days must be a non-negative integer'}), 400
+    counts = archive_done_tasks(archive_cutoff(days))
+    db.session.commit()
+    return jsonify({'archived': counts, 'rev': current_revision()[0]})
+
+@app.cli.command('archive')
+@click.option('--days', type=int, default=None, help='Age in days (default ARCHIVE_AFTER_DAYS).')
+def archive_command(days):
+    """Move tasks done more than --days ago to the archive tables."""
+    if days is None:
+        days = app.config['ARCHIVE_AFTER_DAYS']
+    counts = archive_done_tasks(archive_cutoff(days))
+    db.session.commit()
+    click.echo(f"Archived {counts['tasks']} tasks and {counts['notes']} notes")
+
 # --- API: PDF EXPORT ---
+def _pdf_rows(notes_since=None, notes_until=None):
+    """
+    Not-done tasks in board order and their non-empty notes, in two queries.
+
+    Returns (task_rows, notes_by_task): rows are (category id, category
+    name, task id, text, person id, person name) and notes (date, content)
+    in creation order. Done tasks and notes outside [notes_since,
+    notes_until] (YYYY-MM-DD, either may be None) are filtered in SQL.
+    """
+    active = Task.done.is_not(True)
+    task_rows = db.session.execute(
+        db.select(Category.id, Category.name, Task.id, Task.text, Task.person_id, Person.name)
+        .join(Task, Task.category_id == Category.id)
+        .outerjoin(Person, Person.id == Task.person_id)
+        .where(active)
+        .order_by(Category.order, Category.id, Task.order, Task.id)
+    ).all()
+
+    note_query = (
+        db.select(Note.task_id, Note.date, Note.content)
+        .join(Task, Task.id == Note.task_id)
+        .where(active, Note.content.is_not(None), db.func.trim(Note.content) != '')
+    )
+    if notes_since:
+        note_query = note_query.where(Note.date >= notes_since)
+    if notes_until:
+        note_query = note_query.where(Note.date <= notes_until)
+    notes_by_task = {}
+    for task_id, date, content in db.session.execute(note_query.order_by(Note.task_id, Note.id)):
+        notes_by_task.setdefault(task_id, []).append((date, content))
+    return task_rows, notes_by_task
+
+def _pdf_sections(task_rows, notes_by_task):
+    """Group _pdf_rows() output by category, as render_pdf() expects it."""
+    sections = []
+    for cat_id, cat_name, task_id, text, _, who in task_rows:
+        if not sections or sections[-1]['id'] != cat_id:
+            sections.append({'id': cat_id, 'name': cat_name, 'tasks': []})
+        sections[-1]['tasks'].append({
+            'who': who or '--',
+            'text': text,
+            'notes': notes_by_task.get(task_id, [])
+        })
+    return sections
+
+def collect_pdf_sections(notes_since=None, notes_until=None):
+    """
+    Not-done tasks grouped by category, with their non-empty notes.
+
+    Two queries whatever the board size (see _pdf_rows). Returns plain
+    lists/dicts so the result can be cached or handed to another process.
+    """
+    return _pdf_sections(*_pdf_rows(notes_since, notes_until))
+
+def collect_pdf_batch(first_week, last_day, by_person=False):
+    """
+    The documents of a multi-week export, from a single _pdf_rows() call.
+
+    One document per week starting at first_week (a datetime) up to
+    last_day (YYYY-MM-DD), each with the notes of its own week; with
+    by_person, one per week and assignee instead (unassigned tasks under
+    'Unassigned'). Returns dicts of render_pdf() arguments plus a 'name'.
+    """
+    weeks = []
+    week_start = first_week
+    while week_start.strftime('%Y-%m-%d') <= last_day:
+        weeks.append(week_start)
+        week_start += timedelta(days=7)
+    if not weeks:
+        return []
+    task_rows, notes_by_task = _pdf_rows(weeks[0].strftime('%Y-%m-%d'),
+                                         (weeks[-1] + timedelta(days=6)).strftime('%Y-%m-%d'))
+
+    if by_person:
+        groups = {}
+        for row in task_rows:
+            groups.setdefault(row[4], (row[5] or 'Unassigned', []))[1].append(row)
+        groups = sorted(groups.values(), key=lambda g: (g[0] == 'Unassigned', g[0].lower()))
+    else:
+        groups = [(None, task_rows)]
+
+    documents = []
+    for week_start in weeks:
+        since = week_start.strftime('%Y-%m-%d')
+        until = (week_start + timedelta(days=6)).strftime('%Y-%m-%d')
+        week_notes = {task_id: [n for n in notes if since <= n[0] <= until]
+                      for task_id, notes in notes_by_task.items()}
+        for person, rows in groups:
+            name = since
+            if person is not None:
+                name += '_' + (re.sub(r'[^A-Za-z0-9]+', '-', person).strip('-') or 'person')
+            documents.append({'name': name, 'week_start': week_start, 'heading': person,
+                              'sections': _pdf_sections(rows, week_notes)})
+    return documents
+
+def render_pdf(week_start, sections):
+    """Build the weekly PDF; ReportLab is imported on the first call, see pdf_export."""
+    from pdf_export import render_pdf
+    return render_pdf(week_start, sections)
+
+def _pdf_export_params(params):
+    """
+    Resolve export parameters into (week_start, notes_since, notes_until, cache_key).
+
+    params is request.args or a JSON body. Raises ValueError on bad input.
+    """
+    # Get current week info from params or default to current week
+    week_start_str = params.get('week_start')
+    if week_start_str:
+        week_start = datetime.strptime(week_start_str, '%Y-%m-%d')
+    else:
+        week_start = default_week_start()
+    week_end = week_start + timedelta(days=6)
+
+    # Which notes to print: all of them (default, matches the app), only
+    # the exported week, or the week plus lookback_days before it
+    notes_scope = params.get('notes', 'all')
+    lookback_days = params.get('lookback_days')
+    lookback_days = int(lookback_days) if lookback_days not in (None, '') else None
+    if notes_scope not in ('all', 'week') or (lookback_days is not None and lookback_days < 0):
+        raise ValueError('notes must be all or week, lookback_days >= 0')
+    notes_since = notes_until = None
+    if notes_scope == 'week' or lookback_days is not None:
+        notes_since = (week_start - timedelta(days=lookback_days or 0)).strftime('%Y-%m-%d')
+        notes_until = week_end.strftime('%Y-%m-%d')
+
+    # The document only depends on the week, the note window and the board
+    # contents, so this key identifies it completely
+    rev, _ = current_revision()
+    cache_key = PdfCache.make_key(week_start.strftime('%Y-%m-%d'), notes_since, notes_until, rev)
+    return week_start, notes_since, notes_until, cache_key
+
 @app.route('/api/export-pdf', methods=['GET'])
 def export_pdf():
     """Generate a print-friendly PDF with Category, Who?, and Task columns"""
     try:
-        # Get current week info from query params or default to current week
-        week_start_str = request.args.get('week_start')
-        if week_start_str:
-            week_start = datetime.strptime(week_start_str, '%Y-%m-%d')
-        else:
-            # Default to last Friday
-            today = datetime.now()
-            day = today.weekday()
-            diff = (day + 2) % 7
-            week_start = today - timedelta(days=diff)
-        
-        week_end = week_start + timedelta(days=6)
-        
-        # Fetch all categories with tasks
-        categories = Category.query.order_by(Category.order).all()
-        people_dict = {p.id: p.name for p in Person.query.all()}
-        
-        # Fetch all notes (not only for the current week), so PDF matches app behaviour
-        notes = Note.query.all()
-        notes_by_task = {}
-        for note in notes:
-            if note.task_id not in notes_by_task:
-                notes_by_task[note.task_id] = []
-            notes_by_task[note.task_id].append(note)
-        
-        # Create PDF in memory
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                               topMargin=0.5*inch, bottomMargin=0.5*inch,
-                               leftMargin=0.75*inch, rightMargin=0.75*inch)
-        
-        # Container for PDF elements
-        elements = []
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.black,
-            spaceAfter=6,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        month_style = ParagraphStyle(
-            'MonthStyle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#d63384'),
-            spaceAfter=4,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        week_style = ParagraphStyle(
-            'WeekStyle',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor=colors.darkgray,
-            spaceAfter=20,
-            alignment=TA_CENTER
-        )
-        
-        category_style = ParagraphStyle(
-            'CategoryStyle',
-            parent=styles['Heading3'],
-            fontSize=12,
-            textColor=colors.black,
-            spaceAfter=8,
-            spaceBefore=12,
-            fontName='Helvetica-Bold',
-            leftIndent=0
-        )
-        
-        task_style = ParagraphStyle(
-            'TaskStyle',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.black,
-            leftIndent=20,
-            spaceAfter=4
-        )
-        
-        note_style = ParagraphStyle(
-            'NoteStyle',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#3498db'),
-            leftIndent=20
-        )
-        
-        # Header with just Month and Week
-        month_names = ["JANUARY", "FEBRUARY", "MARCH", "APRIL", "MAY", "JUNE",
-                      "JULY", "AUGUST", "SEPTEMBER", "OCTOBER", "NOVEMBER", "DECEMBER"]
-        month_text = f"{month_names[week_start.month - 1]} {week_start.year}"
-        elements.append(Paragraph(month_text, month_style))
-        
-        # Python weekday(): Monday=0 ... Sunday=6, so order must start at Monday
-        days_short = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        week_text = f"{days_short[week_start.weekday()]} {week_start.day} - {days_short[week_end.weekday()]} {week_end.day}"
-        elements.append(Paragraph(week_text, week_style))
-        
-        # Content - Categories and Tasks
-        for category in categories:
-            # Filter to only tasks that are not done
-            active_tasks = [t for t in category.tasks if not t.done]
-            if len(active_tasks) == 0:
-                continue
-
-            # Category header
-            elements.append(Paragraph(category.name.upper(), category_style))
-
-            # Tasks under this category (only not done)
-            for task in active_tasks:
-                # Task line with WHO? and text
-                who = people_dict.get(task.person_id, '--')
-                task_text = f"<b>[{who}]</b> {task.text}"
-                elements.append(Paragraph(task_text, task_style))
-
-                # Note previews for this task
-                if task.id in notes_by_task:
-                    for note in notes_by_task[task.id]:
-                        if note.content.strip():
-                            note_date = datetime.strptime(note.date, '%Y-%m-%d')
-                            day_name = days_short[note_date.weekday()]
-                            note_text = f"({day_name} {note_date.day}) {note.content}"
-                            elements.append(Paragraph(note_text, note_style))
-
-                elements.append(Spacer(1, 0.1*inch))
-        
-        # Footer - App name small at bottom
-        footer_style = ParagraphStyle(
-            'FooterStyle',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.gray,
-            alignment=TA_CENTER,
-            spaceBefore=20
-        )
-        elements.append(Spacer(1, 0.3*inch))
-        elements.append(Paragraph("SEB OPS SYSTEM v5", footer_style))
-        
-        # Build PDF
-        doc.build(elements)
-        
-        # Get PDF from buffer
-        buffer.seek(0)
-        
-        # Generate filename with date
-        filename = f"SEB_OPS_{week_start.strftime('%Y-%m-%d')}.pdf"
-        
-        return send_file(
-            buffer,
-            mimetype='application/pdf',
-            as_attachment=False
-        )
+        try:
+            week_start, notes_since, notes_until, cache_key = _pdf_export_params(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # An unchanged board is served from the cache without touching ReportLab
+        cached = pdf_cache.get(cache_key)
+        if cached is not None:
+            return _pdf_response(cached, 'hit')
+
+        sections = collect_pdf_sections(notes_since, notes_until)
+        pdf = render_pdf(week_start, sections)
+        pdf_cache.put(cache_key, pdf)
+        return _pdf_response(pdf, 'miss')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/export-pdf/batch', methods=['GET'])
+def export_pdf_batch():
+    """
+    Every week from start to end in one download: a ZIP of weekly PDFs
+    (format=zip, rendered in parallel) or one PDF with bookmarks
+    (format=pdf). group=person makes one document per week and person.
+    """
+    start, end = request.args.get('start'), request.args.get('end') or request.args.get('start')
+    group = request.args.get('group', 'week')
+    fmt = request.args.get('format', 'zip')
+    try:
+        first_week = datetime.strptime(start or '', '%Y-%m-%d')
+        last_day = datetime.strptime(end, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+    if group not in ('week', 'person') or fmt not in ('zip', 'pdf'):
+        return jsonify({'error': 'group must be week or person, format zip or pdf'}), 400
+    if last_day < first_week:
+        return jsonify({'error': 'end is before start'}), 400
+    if (last_day - first_week).days // 7 + 1 > app.config['PDF_BATCH_MAX_WEEKS']:
+        return jsonify({'error': f"At most {app.config['PDF_BATCH_MAX_WEEKS']} weeks per export"}), 400
+
+    rev, _ = current_revision()
+    cache_key = PdfCache.make_key('batch', start, end, group, fmt, rev)
+    data = pdf_cache.get(cache_key)
+    cache_status = 'hit'
+    if data is None:
+        documents = collect_pdf_batch(first_week, end, by_person=group == 'person')
+        if not documents:
+            return jsonify({'error': 'Nothing to export'}), 404
+        from pdf_export import render_batch, render_combined, zip_documents
+        if fmt == 'pdf':
+            data = render_combined(documents)
+        else:
+            data = zip_documents(documents, render_batch(documents, app.config['PDF_BATCH_WORKERS']))
+        pdf_cache.put(cache_key, data)
+        cache_status = 'miss'
+
+    response = send_file(BytesIO(data), as_attachment=True,
+                         mimetype='application/pdf' if fmt == 'pdf' else 'application/zip',
+                         download_name=f'ops-{start}-to-{end}.{fmt}')
+    response.headers['X-PDF-Cache'] = cache_status
+    return response
+
+# Background variant: POST creates a render job, GET polls it, /pdf fetches it
+@app.route('/api/export-pdf/jobs', methods=['POST'])
+def create_pdf_job():
+    params = request.get_json(silent=True) or request.args
+    try:
+        week_start, notes_since, notes_until, cache_key = _pdf_export_params(params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cached = pdf_cache.get(cache_key)
+    if cached is not None:
+        job = pdf_jobs.completed(cache_key, cached)
+    else:
+        # Queries stay on the request thread (they are cheap and need the
+        # app context); only the ReportLab build goes to the pool
+        sections = collect_pdf_sections(notes_since, notes_until)
+        # pdf_export.render_pdf itself, so a process-pool worker imports
+        # only that module, not the app
+        from pdf_export import render_pdf as build_pdf
+        job = pdf_jobs.submit(cache_key, build_pdf, week_start, sections,
+                              on_done=lambda pdf: pdf_cache.put(cache_key, pdf))
+    return jsonify(_pdf_job_dict(job)), 202
+
+@app.route('/api/export-pdf/jobs/<job_id>', methods=['GET'])
+def get_pdf_job(job_id):
+    job = pdf_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(_pdf_job_dict(job))
+
+@app.route('/api/export-pdf/jobs/<job_id>/pdf', methods=['GET'])
+def get_pdf_job_result(job_id):
+    job = pdf_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    status = job.status
+    if status == 'failed':
+        return jsonify(_pdf_job_dict(job)), 500
+    if status != 'done':
+        return jsonify(_pdf_job_dict(job)), 409
+    return _pdf_response(job.result, 'job')
+
+def _pdf_job_dict(job):
+    data = job.to_dict()
+    data['status_url'] = f'/api/export-pdf/jobs/{job.id}'
+    data['result_url'] = f'/api/export-pdf/jobs/{job.id}/pdf'
+    return data
+
+def _pdf_response(pdf, cache_status):
+    response = send_file(BytesIO(pdf), mimetype='application/pdf', as_attachment=False)
+    response.headers['X-PDF-Cache'] = cache_status
+    return response
+
+# --- ADMIN: PROFILES ---
+# Captures from the opt-in request profiler (see profiler.py).
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    if not app.config['PROFILER_ENABLED']:
+        return jsonify({'error': 'Profiler is disabled'}), 404
+    return jsonify(profile_store.list())
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    # cProfile captures download as .prof (pstats / snakeviz); ?format=text
+    # renders the top entries instead. pyinstrument captures are HTML.
+    if not app.config['PROFILER_ENABLED']:
+        return jsonify({'error': 'Profiler is disabled'}), 404
+    found = profile_store.get(profile_id)
+    if found is None:
+        return jsonify({'error': 'Unknown or pruned profile'}), 404
+    meta, path = found
+    if meta['format'] == 'pyinstrument':
+        return send_file(path, mimetype='text/html')
+    if request.args.get('format') == 'text':
+        return Response(profile_as_text(path), mimetype='text/plain')
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{profile_id}.prof')
+
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        migrate_db()
     app.run(debug=True, port=5000)
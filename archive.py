@@ -0,0 +1,72 @@
+"""
+Archive tier for completed tasks.
+
+Done tasks used to stay on the board forever: /api/init shipped all of them
+and the client hid most behind "MORE DONE". archive_done_tasks() moves
+tasks done before a cutoff date, with their notes, into ArchivedTask /
+ArchivedNote using INSERT ... SELECT and set-based deletes, so the live
+tables only hold the working set. The move leaves tombstones like any
+delete, so synced clients drop the rows through /api/changes.
+"""
+
+from datetime import date, timedelta
+
+from models import (db, Category, Person, Task, Note, Tombstone, ArchivedTask, ArchivedNote,
+                    next_revision)
+
+BATCH_SIZE = 500
+
+
+def archive_cutoff(days, today=None):
+    """Tasks done before this date (YYYY-MM-DD) are due for the archive."""
+    return ((today or date.today()) - timedelta(days=days)).isoformat()
+
+
+def archive_done_tasks(cutoff, batch_size=BATCH_SIZE):
+    """
+    Move tasks done before `cutoff` and their notes to the archive tables.
+
+    Runs in the current session transaction; the caller commits. Returns
+    {'tasks': n, 'notes': n} (zero counts leave the revision untouched).
+    """
+    due = (Task.done.is_(True), Task.done_on < cutoff)
+    task_ids = db.session.scalars(db.select(Task.id).where(*due).order_by(Task.id)).all()
+    counts = {'tasks': 0, 'notes': 0}
+    if not task_ids:
+        return counts
+
+    rev = next_revision()
+    today = date.today().isoformat()
+    for start in range(0, len(task_ids), batch_size):
+        ids = task_ids[start:start + batch_size]
+        note_ids = db.session.scalars(db.select(Note.id).where(Note.task_id.in_(ids))).all()
+        last_archived = db.session.scalar(db.select(db.func.coalesce(db.func.max(ArchivedTask.id), 0)))
+
+        db.session.execute(db.insert(ArchivedTask).from_select(
+            ['task_id', 'category_id', 'category_name', 'person_id', 'person_name',
+             'text', 'order', 'done_on', 'archived_on'],
+            db.select(Task.id, Task.category_id, Category.name, Task.person_id, Person.name,
+                      Task.text, Task.order, Task.done_on, db.literal(today))
+            .outerjoin(Category, Category.id == Task.category_id)
+            .outerjoin(Person, Person.id == Task.person_id)
+            .where(Task.id.in_(ids))
+        ))
+        # Rows inserted just above are the ones with ids past last_archived
+        db.session.execute(db.insert(ArchivedNote).from_select(
+            ['archived_task_id', 'date', 'content'],
+            db.select(ArchivedTask.id, Note.date, Note.content)
+            .join(ArchivedTask, ArchivedTask.task_id == Note.task_id)
+            .where(Note.task_id.in_(ids), ArchivedTask.id > last_archived)
+            .order_by(Note.id)
+        ))
+        db.session.execute(db.delete(Note).where(Note.task_id.in_(ids)))
+        db.session.execute(db.delete(Task).where(Task.id.in_(ids)))
+
+        tombstones = [{'entity': 'task', 'entity_id': i, 'rev': rev} for i in ids]
+        tombstones += [{'entity': 'note', 'entity_id': i, 'rev': rev} for i in note_ids]
+        db.session.execute(db.insert(Tombstone), tombstones)
+        counts['tasks'] += len(ids)
+        counts['notes'] += len(note_ids)
+    # Core deletes bypass the ORM; drop any stale copies from the identity map
+    db.session.expire_all()
+    return counts
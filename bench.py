@@ -0,0 +1,309 @@
+"""
+Load and latency benchmarks for SEB OPS SYSTEM v5.
+
+Builds synthetic boards of several sizes in a throwaway SQLite file and
+drives the API through the Flask test client, so no server is needed and
+runs are comparable between commits on the same machine:
+
+    python bench.py                                   # small + medium
+    python bench.py --sizes small,medium,large --output bench.json
+    python bench.py --compare bench-main.json         # print p50 / p95 deltas
+
+Every endpoint reports latency percentiles (ms) and sequential throughput
+(requests/s); backup and restore also report rows/s. Cold start (importing
+the app and serving the first /api/init in a new interpreter) is timed
+separately. Seeding is
+deterministic (fixed random seed), and notes are spread over the weeks
+leading up to today so the current-week queries hit real data.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# The app binds its engine on import: point it at a scratch file first
+_DB_PATH = os.path.join(tempfile.gettempdir(), f'seb_ops_bench_{os.getpid()}.db')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + _DB_PATH)
+
+from app import app, default_week_start, pdf_cache  # noqa: E402
+from migrations import migrate_db  # noqa: E402
+from models import db, Category, Person, Task, Note  # noqa: E402
+from search import search_index_deferred  # noqa: E402
+
+# name -> (categories, tasks per category, people, notes)
+SIZES = {
+    'tiny': (3, 3, 2, 200),
+    'small': (10, 10, 5, 10_000),
+    'medium': (100, 10, 20, 100_000),
+    'large': (1000, 10, 50, 1_000_000),
+}
+DEFAULT_SIZES = ('small', 'medium')
+INSERT_BATCH = 50_000
+SEED = 1234
+
+
+def seed_board(n_categories, tasks_per_category, n_people, n_notes):
+    """Bulk-insert a board; notes cover one day per task going back from today."""
+    db.session.execute(db.insert(Category), [
+        {'id': c, 'name': f'Category {c}', 'color': '#336699', 'order': c * 1024.0}
+        for c in range(1, n_categories + 1)
+    ])
+    db.session.execute(db.insert(Person), [{'id': p, 'name': f'Person {p}'} for p in range(1, n_people + 1)])
+    n_tasks = n_categories * tasks_per_category
+    rng = random.Random(SEED)
+    today = date.today()
+    tasks = []
+    for t in range(1, n_tasks + 1):
+        done = rng.random() < 0.2
+        tasks.append({
+            'id': t, 'category_id': (t - 1) // tasks_per_category + 1,
+            'person_id': rng.randint(1, n_people), 'text': f'Task {t} ' + 'lorem ipsum ' * rng.randint(1, 6),
+            'done': done, 'done_on': today.isoformat() if done else None,
+            'order': ((t - 1) % tasks_per_category + 1) * 1024.0,
+        })
+    with search_index_deferred(db.session.connection()):
+        db.session.execute(db.insert(Task), tasks)
+        for start in range(0, n_notes, INSERT_BATCH):
+            db.session.execute(db.insert(Note), [
+                {'task_id': i % n_tasks + 1, 'date': (today - timedelta(days=i // n_tasks)).isoformat(),
+                 'content': f'Note {i} ' + 'dolor sit amet ' * rng.randint(1, 8)}
+                for i in range(start, min(start + INSERT_BATCH, n_notes))
+            ])
+    db.session.commit()
+    return {'categories': n_categories, 'tasks': n_tasks, 'people': n_people, 'notes': n_notes}
+
+
+def summarize(timings, total=None):
+    """Latency percentiles (ms) and throughput for a list of durations (s)."""
+    timings = sorted(timings)
+    n = len(timings)
+
+    def pct(p):
+        return round(timings[min(n - 1, int(round(p / 100 * (n - 1))))] * 1000, 3)
+
+    total = total if total is not None else sum(timings)
+    return {
+        'n': n,
+        'p50_ms': pct(50),
+        'p95_ms': pct(95),
+        'p99_ms': pct(99),
+        'mean_ms': round(sum(timings) / n * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+        'throughput_rps': round(n / total, 2) if total else None,
+    }
+
+
+def measure(client, n, method, url, kwargs_for=None):
+    """Issue n requests and time each one up to the last byte of the body."""
+    timings, size = [], 0
+    started = time.perf_counter()
+    for i in range(n):
+        kwargs = kwargs_for(i) if kwargs_for else {}
+        start = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        body = response.get_data()
+        timings.append(time.perf_counter() - start)
+        response.close()
+        if response.status_code != 200:
+            raise RuntimeError(f'{method} {url}: {response.status_code} {body[:200]!r}')
+        size = len(body)
+    result = summarize(timings, time.perf_counter() - started)
+    result['bytes'] = size
+    return result
+
+
+def bench_size(client, size, requests, heavy_requests=3):
+    """Rebuild the database at `size` and time every endpoint against it."""
+    n_categories, tasks_per_category, n_people, n_notes = SIZES[size]
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        migrate_db()
+        start = time.perf_counter()
+        rows = seed_board(n_categories, tasks_per_category, n_people, n_notes)
+        seed_seconds = time.perf_counter() - start
+    n_tasks = rows['tasks']
+    week_start = default_week_start()
+    rng = random.Random(SEED)
+
+    results = {}
+    results['init'] = measure(client, requests, 'GET', '/api/init')
+    results['notes_week'] = measure(client, requests, 'GET', '/api/notes')
+
+    def note_body(i):
+        day = (week_start + timedelta(days=rng.randint(0, 6))).strftime('%Y-%m-%d')
+        return {'json': {'task_id': rng.randint(1, n_tasks), 'date': day, 'content': f'bench {i}'}}
+    results['upsert_note'] = measure(client, requests, 'POST', '/api/notes', note_body)
+
+    results['backup_ndjson'] = measure(client, heavy_requests, 'GET', '/api/backup?stream=ndjson')
+    body = client.get('/api/backup?stream=ndjson').get_data()
+    start = time.perf_counter()
+    response = client.post('/api/restore', data=body, content_type='application/x-ndjson')
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f'restore: {response.status_code} {response.get_data(as_text=True)[:200]}')
+    restored = sum(response.get_json()['restored'].values())
+    results['restore_ndjson'] = {'n': 1, 'seconds': round(elapsed, 3), 'rows': restored,
+                                 'rows_per_second': round(restored / elapsed), 'bytes': len(body)}
+    results['backup_ndjson']['rows_per_second'] = round(
+        restored / (results['backup_ndjson']['mean_ms'] / 1000))
+
+    def uncached(i):
+        pdf_cache.clear()
+        return {}
+    results['export_pdf'] = measure(client, heavy_requests, 'GET', '/api/export-pdf', uncached)
+    results['export_pdf_cached'] = measure(client, requests, 'GET', '/api/export-pdf')
+
+    return {'rows': rows, 'seed_seconds': round(seed_seconds, 3), 'endpoints': results}
+
+
+# Run in a fresh interpreter: what a restarted worker pays before its first response
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import app
+from migrations import migrate_db
+imported = time.perf_counter()
+with app.app_context():
+    migrate_db()
+client = app.test_client()
+ready = time.perf_counter()
+status = client.get('/api/init').status_code
+done = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'first_request_ms': (done - ready) * 1000,
+                  'status': status, 'reportlab_loaded': 'reportlab' in sys.modules}))
+"""
+
+
+def measure_cold_start(runs=5):
+    """Time `import app` and the first /api/init in new processes."""
+    path = os.path.join(tempfile.gettempdir(), f'seb_ops_bench_cold_{os.getpid()}.db')
+    env = {**os.environ, 'DATABASE_URL': 'sqlite:///' + path}
+    samples = []
+    try:
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, '-c', COLD_START_SCRIPT], capture_output=True, text=True,
+                                 check=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+    if any(s['status'] != 200 for s in samples):
+        raise RuntimeError(f'cold start: /api/init answered {samples[-1]["status"]}')
+    result = {}
+    for key in ('import_ms', 'first_request_ms'):
+        values = sorted(s[key] for s in samples)
+        result[key] = {'p50_ms': round(values[len(values) // 2], 3), 'min_ms': round(values[0], 3),
+                       'max_ms': round(values[-1], 3)}
+    result['reportlab_loaded'] = any(s['reportlab_loaded'] for s in samples)
+    return result
+
+
+def environment():
+    """Enough context to tell whether two reports are comparable."""
+    commit = None
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    try:
+        import orjson  # noqa: F401
+        json_backend = 'orjson'
+    except ImportError:
+        json_backend = 'stdlib'
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'json': json_backend,
+    }
+
+
+def run(sizes=DEFAULT_SIZES, requests=50, heavy_requests=3, cold_starts=5, log=print):
+    app.config['TESTING'] = True
+    app.config['METRICS_SLOW_REQUEST_MS'] = None  # the report has the numbers
+    client = app.test_client()
+    report = {'environment': environment(), 'requests': requests, 'heavy_requests': heavy_requests, 'sizes': {}}
+    if cold_starts:
+        report['cold_start'] = cold = measure_cold_start(cold_starts)
+        log(f'[cold start] import {cold["import_ms"]["p50_ms"]:.0f} ms, first /api/init '
+            f'{cold["first_request_ms"]["p50_ms"]:.0f} ms (p50 of {cold_starts}), '
+            f'ReportLab loaded: {cold["reportlab_loaded"]}')
+    for size in sizes:
+        log(f'[{size}] seeding {SIZES[size]} ...')
+        report['sizes'][size] = result = bench_size(client, size, requests, heavy_requests)
+        for name, r in result['endpoints'].items():
+            if 'p50_ms' in r:
+                log(f'[{size}] {name:18} p50 {r["p50_ms"]:9.2f} ms  p95 {r["p95_ms"]:9.2f} ms  '
+                    f'{r["throughput_rps"]:8.1f} req/s')
+            else:
+                log(f'[{size}] {name:18} {r["rows"]} rows in {r["seconds"]:.2f}s ({r["rows_per_second"]:,} rows/s)')
+    return report
+
+
+def compare(report, baseline, log=print):
+    """Print p50 / p95 changes against an earlier report (positive = slower)."""
+    if 'cold_start' in report and 'cold_start' in baseline:
+        for key in ('import_ms', 'first_request_ms'):
+            b, r = baseline['cold_start'][key]['p50_ms'], report['cold_start'][key]['p50_ms']
+            log(f'[cold start] {key[:-3]:18} p50 {b:8.2f} -> {r:8.2f} ms ({(r - b) / b * 100 if b else 0:+6.1f}%)')
+    for size, result in report['sizes'].items():
+        base = baseline.get('sizes', {}).get(size)
+        if not base:
+            continue
+        for name, r in result['endpoints'].items():
+            b = base['endpoints'].get(name)
+            if not b or 'p50_ms' not in r or 'p50_ms' not in b:
+                continue
+            deltas = '  '.join(
+                f'{key[:3]} {b[key]:8.2f} -> {r[key]:8.2f} ms ({(r[key] - b[key]) / b[key] * 100 if b[key] else 0:+6.1f}%)'
+                for key in ('p50_ms', 'p95_ms'))
+            log(f'[{size}] {name:18} {deltas}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+                        help=f'comma-separated board sizes from {", ".join(SIZES)}')
+    parser.add_argument('--requests', type=int, default=50, help='requests per light endpoint')
+    parser.add_argument('--heavy-requests', type=int, default=3,
+                        help='requests for backup and uncached PDF export')
+    parser.add_argument('--cold-starts', type=int, default=5,
+                        help='fresh interpreters to time for start-up (0 to skip)')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--compare', help='JSON report from an earlier run to diff against')
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(',') if s]
+    unknown = set(sizes) - set(SIZES)
+    if unknown:
+        parser.error(f'unknown sizes: {", ".join(sorted(unknown))}')
+
+    try:
+        report = run(sizes, args.requests, args.heavy_requests, args.cold_starts, log=lambda msg: print(msg, file=sys.stderr))
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(_DB_PATH)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f), log=lambda msg: print(msg, file=sys.stderr))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+gzip / brotli compression for responses.
+
+Dynamic responses (JSON, HTML) are compressed in an after_request hook when
+the client accepts it and the body is at least COMPRESS_MIN_SIZE bytes;
+streamed responses are compressed chunk by chunk as they go out. Small
+bodies are memoized by content hash, so the landing pages, which render
+the same bytes every time, are compressed once.
+
+Static files are precompressed once at startup into COMPRESS_STATIC_DIR
+(under the instance folder, static/ itself may be read-only) and served
+from there with send_file, which keeps its own ETag and 304 handling.
+
+brotli is optional; without it only gzip is offered.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request, send_file
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/html', 'text/css', 'text/javascript', 'text/plain', 'image/svg+xml',
+}
+STATIC_SUFFIXES = ('.css', '.js', '.html', '.json', '.svg', '.txt')
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+MEMO_MAX_ENTRIES = 32
+MEMO_MAX_BODY = 256 * 1024
+
+
+def _compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _compress_stream(chunks, encoding, level):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        compress, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+        compress, finish = compressor.compress, compressor.flush
+    try:
+        for chunk in chunks:
+            out = compress(chunk)
+            if out:
+                yield out
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+class Compressor:
+    def __init__(self, min_size=1024, gzip_level=6, brotli_level=5, static_dir=None):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_level = brotli_level
+        self.static_dir = static_dir
+        self._static = {}  # static filename -> {encoding: precompressed path}
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            min_size=config['COMPRESS_MIN_SIZE'],
+            gzip_level=config['COMPRESS_GZIP_LEVEL'],
+            brotli_level=config['COMPRESS_BROTLI_LEVEL'],
+            static_dir=config['COMPRESS_STATIC_DIR'],
+        )
+
+    def level(self, encoding):
+        return self.brotli_level if encoding == 'br' else self.gzip_level
+
+    def negotiate(self, available=None):
+        """Best encoding the client accepts, or None."""
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding == 'br' and brotli is None:
+                continue
+            if available is not None and encoding not in available:
+                continue
+            if accepted[encoding] > 0:
+                return encoding
+        return None
+
+    # --- static files ---
+
+    def precompress_static(self, static_folder):
+        """Write .gz (and .br) copies of compressible static files, skipping
+        ones already up to date; called once at startup."""
+        encodings = ['gzip'] + (['br'] if brotli is not None else [])
+        for root, _, files in os.walk(static_folder):
+            for name in files:
+                if not name.endswith(STATIC_SUFFIXES):
+                    continue
+                source = os.path.join(root, name)
+                filename = os.path.relpath(source, static_folder).replace(os.sep, '/')
+                if os.path.getsize(source) < self.min_size:
+                    continue
+                variants = {}
+                for encoding in encodings:
+                    target = os.path.join(self.static_dir, filename + SUFFIXES[encoding])
+                    if (not os.path.exists(target)
+                            or os.path.getmtime(target) < os.path.getmtime(source)):
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        with open(source, 'rb') as f:
+                            data = _compress(f.read(), encoding, 11 if encoding == 'br' else 9)
+                        tmp = f'{target}.{os.getpid()}.tmp'
+                        with open(tmp, 'wb') as f:
+                            f.write(data)
+                        os.replace(tmp, target)
+                    variants[encoding] = target
+                self._static[filename] = variants
+
+    def _static_response(self, response):
+        variants = self._static.get(request.view_args.get('filename'))
+        encoding = variants and self.negotiate(variants)
+        if not encoding:
+            return response
+        compressed = send_file(variants[encoding], mimetype=response.mimetype,
+                               conditional=True, max_age=response.cache_control.max_age)
+        compressed.headers['Content-Encoding'] = encoding
+        compressed.vary.add('Accept-Encoding')
+        response.close()
+        return compressed
+
+    # --- dynamic responses ---
+
+    def _memoized(self, data, encoding):
+        key = (encoding, hashlib.sha1(data).digest())
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        compressed = _compress(data, encoding, self.level(encoding))
+        with self._lock:
+            self._memo[key] = compressed
+            while len(self._memo) > MEMO_MAX_ENTRIES:
+                self._memo.popitem(last=False)
+        return compressed
+
+    def after_request(self, response):
+        if request.endpoint == 'static':
+            if response.status_code == 200 and self._static:
+                return self._static_response(response)
+            return response
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding, self.level(encoding))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            if len(data) <= MEMO_MAX_BODY:
+                response.set_data(self._memoized(data, encoding))
+            else:
+                response.set_data(_compress(data, encoding, self.level(encoding)))
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes are a different representation: keep the
+        # revision ETag but mark it weak (If-None-Match compares weakly).
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def init_compression(app):
+    compressor = Compressor.from_config(app.config)
+    if app.static_folder:
+        try:
+            compressor.precompress_static(app.static_folder)
+        except OSError:
+            app.logger.exception('Static precompression failed; serving uncompressed files')
+    app.after_request(compressor.after_request)
+    return compressor
@@ -0,0 +1,92 @@
+"""
+Database engine configuration.
+
+DATABASE_URL selects the database (default: instance/ops.db). For SQLite,
+every new connection is switched to WAL with the pragmas below, so readers
+no longer block behind a writer and concurrent writers wait on a busy
+timeout instead of failing with "database is locked". Each setting can be
+overridden from the environment under the same name.
+"""
+
+import os
+
+from sqlalchemy import event
+
+from models import db
+
+DEFAULTS = {
+    'DATABASE_URL': 'sqlite:///ops.db',
+    # SQLite
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',            # durable with WAL, one fsync per checkpoint
+    'SQLITE_CACHE_SIZE': -20000,               # negative = KiB, so ~20 MB per connection
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    # Connection pool (SQLite file databases use a QueuePool too)
+    'DB_POOL_SIZE': 5,
+    'DB_MAX_OVERFLOW': 10,
+    'DB_POOL_TIMEOUT': 30,
+    'DB_POOL_RECYCLE': 1800,
+}
+
+
+def database_settings(environ=os.environ):
+    """DEFAULTS, overridden by environment variables of the same name."""
+    settings = {}
+    for key, default in DEFAULTS.items():
+        value = environ.get(key)
+        settings[key] = default if value is None else type(default)(value)
+    return settings
+
+
+def engine_options(settings):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database."""
+    url = settings['DATABASE_URL']
+    if url in ('sqlite://', 'sqlite:///:memory:'):
+        return {}  # single in-memory connection, nothing to pool
+    options = {
+        'pool_size': settings['DB_POOL_SIZE'],
+        'max_overflow': settings['DB_MAX_OVERFLOW'],
+        'pool_timeout': settings['DB_POOL_TIMEOUT'],
+    }
+    if not url.startswith('sqlite'):
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = settings['DB_POOL_RECYCLE']
+    return options
+
+
+def sqlite_pragmas(settings):
+    return [
+        f"PRAGMA journal_mode={settings['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={settings['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size={settings['SQLITE_CACHE_SIZE']}",
+        f"PRAGMA mmap_size={settings['SQLITE_MMAP_SIZE']}",
+        f"PRAGMA busy_timeout={settings['SQLITE_BUSY_TIMEOUT_MS']}",
+    ]
+
+
+def install_sqlite_pragmas(engine, settings):
+    """Run the tuning pragmas on every new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(settings)
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def init_database(app):
+    """Configure SQLAlchemy for app from the environment and bind db to it."""
+    settings = database_settings()
+    app.config.update(settings)
+    app.config['SQLALCHEMY_DATABASE_URI'] = settings['DATABASE_URL']
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(settings)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            install_sqlite_pragmas(engine, settings)
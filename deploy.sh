@@ -42,10 +42,10 @@ pip install -r requirements.txt
 # Step 7: Initialize database (if needed)
 echo "🗄️  Step 7: Ensuring database is initialized..."
 python << EOF
-from app import app, db
+from app import app, migrate_db
 with app.app_context():
-    db.create_all()
-    print("✅ Database tables initialized")
+    migrate_db()
+    print("✅ Database tables initialized and migrated")
 EOF
 
 echo ""
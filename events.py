@@ -0,0 +1,54 @@
+"""
+In-process fan-out of board changes to /api/stream clients.
+
+Every write already bumps the board revision (models.next_revision), so the
+only thing worth broadcasting is "the board is now at revision N". The
+streaming view turns that into a compact /api/changes-style delta for each
+client. Waiters share one Condition instead of owning a queue each, so a
+slow client can never pile up events: it simply catches up from its own
+revision the next time it wakes. Readers take `seq` before looking at the
+database so a commit landing in between still wakes them.
+
+This covers a single process. With several workers the stream also
+re-reads the revision from the database on every keep-alive, so other
+processes' writes arrive at most one keep-alive interval late.
+"""
+
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class BoardEvents:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.seq = 0  # bumped on every publish
+        self.rev = 0  # last published revision
+
+    def publish(self, rev):
+        with self._cond:
+            self.seq += 1
+            self.rev = rev
+            self._cond.notify_all()
+
+    def wait(self, seq, timeout):
+        """Block until something is published after `seq` was read, or until
+        `timeout` seconds pass. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.seq != seq, timeout)
+
+
+board_events = BoardEvents()
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_revision(session):
+    rev = session.info.pop('pending_rev', None)
+    if rev is not None:
+        board_events.publish(rev)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_revision(session):
+    session.info.pop('pending_rev', None)
@@ -0,0 +1,75 @@
+"""
+JSON encoding for API responses.
+
+Flask's default provider goes through the stdlib json module, which is the
+bulk of the time spent on /api/init and /api/backup once the queries
+return plain rows (see models.row_dicts). When orjson is installed it is
+used instead; otherwise everything falls back to the stdlib and behaves
+exactly like Flask's own provider.
+"""
+
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _orjson_option(sort_keys=False, indent=None):
+    # Dates go through Flask's default() so they are formatted as before
+    option = orjson.OPT_PASSTHROUGH_DATETIME
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return option
+
+
+def dumps(obj):
+    """Compact JSON text for obj (no key sorting); used by the backup stream."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default,
+                            option=_orjson_option()).decode()
+    return json.dumps(obj)
+
+
+def loads(s):
+    """Parse JSON text or bytes; errors are ValueError subclasses either way."""
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider that encodes with orjson when it is available."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'sort_keys', 'indent', 'default'}:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, kwargs).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = None
+        if self.compact is None and self._app.debug or self.compact is False:
+            indent = 2
+        body = self._encode(obj, {'indent': indent}) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def _encode(self, obj, kwargs):
+        option = _orjson_option(kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent'))
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option)
+
+
+def init_json(app):
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,217 @@
+"""
+Request metrics and the Prometheus /metrics endpoint.
+
+init_metrics(app) times every request and records, per route (the URL
+rule, so /api/tasks/<int:id> is one series): a latency histogram, the
+status code, the response size and the SQL statements it ran (counted and
+timed through SQLAlchemy cursor events). Requests slower than
+METRICS_SLOW_REQUEST_MS are logged with their query breakdown.
+
+Everything is kept in process memory behind one lock: a request costs a
+few dict updates and each statement two perf_counter() calls. With several
+worker processes each one exposes its own numbers, which Prometheus sums.
+Latency is measured up to the response object; the body of a streamed
+response is not included.
+
+Code outside the request cycle records through the module-level `metrics`
+registry, e.g. `with metrics.timer('pdf_build_seconds'):` around the
+ReportLab build. Renders in a process-pool worker land in that worker's
+registry and are not exported.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+HELP = {
+    'http_request_duration_seconds': ('histogram', 'Time to build the response, per route.'),
+    'http_requests_total': ('counter', 'Requests served, per route and status.'),
+    'http_response_size_bytes': ('summary', 'Response body size (streamed bodies not counted).'),
+    'db_queries_per_request': ('histogram', 'SQL statements run by one request.'),
+    'db_query_duration_seconds': ('summary', 'Time spent in SQL statements, per route.'),
+    'pdf_build_seconds': ('histogram', 'ReportLab document build time.'),
+}
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}                   # (name, labels) -> _Histogram
+        self._counters = defaultdict(float)     # (name, labels) -> value
+        self._summaries = defaultdict(lambda: [0.0, 0])  # (name, labels) -> [sum, count]
+        self._local = threading.local()
+
+    def observe(self, name, value, labels=(), buckets=LATENCY_BUCKETS):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            self._counters[(name, labels)] += value
+
+    def summarize(self, name, value, labels=()):
+        with self._lock:
+            summary = self._summaries[(name, labels)]
+            summary[0] += value
+            summary[1] += 1
+
+    @contextmanager
+    def timer(self, name, labels=()):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._summaries.clear()
+
+    # --- SQL accounting for the request running on this thread ---
+
+    def start_request(self):
+        self._local.queries = [0, 0.0]  # count, seconds
+
+    def finish_request(self):
+        queries = getattr(self._local, 'queries', None)
+        self._local.queries = None
+        return queries or [0, 0.0]
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        queries = getattr(self._local, 'queries', None)
+        start = getattr(context, '_metrics_start', None)
+        if queries is not None and start is not None:
+            elapsed = time.perf_counter() - start
+            queries[0] += 1
+            queries[1] += elapsed
+
+    def watch_engine(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    # --- Prometheus text format ---
+
+    def render(self):
+        with self._lock:
+            histograms = {k: (list(h.counts), h.sum, h.count, h.buckets) for k, h in self._histograms.items()}
+            counters = dict(self._counters)
+            summaries = {k: tuple(v) for k, v in self._summaries.items()}
+
+        series = defaultdict(list)
+        for (name, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                series[name].append(_line(f'{name}_bucket', labels + (('le', _number(bound)),), cumulative))
+            series[name].append(_line(f'{name}_bucket', labels + (('le', '+Inf'),), count))
+            series[name].append(_line(f'{name}_sum', labels, total))
+            series[name].append(_line(f'{name}_count', labels, count))
+        for (name, labels), value in sorted(counters.items()):
+            series[name].append(_line(name, labels, value))
+        for (name, labels), (total, count) in sorted(summaries.items()):
+            series[name].append(_line(f'{name}_sum', labels, total))
+            series[name].append(_line(f'{name}_count', labels, count))
+
+        out = []
+        for name in sorted(series):
+            kind, help_text = HELP.get(name, ('untyped', name))
+            out.append(f'# HELP {name} {help_text}')
+            out.append(f'# TYPE {name} {kind}')
+            out.extend(series[name])
+        return '\n'.join(out) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _line(name, labels, value):
+    if labels:
+        escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+        name += '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+    return f'{name} {_number(value)}'
+
+
+metrics = Metrics()
+
+
+def init_metrics(app, db, registry=metrics):
+    """Instrument app's requests and db's engines, and serve /metrics."""
+    if not app.config['METRICS_ENABLED']:
+        return None
+    with app.app_context():
+        for engine in db.engines.values():
+            registry.watch_engine(engine)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        registry.start_request()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        query_count, query_time = registry.finish_request()
+        route = request.url_rule.rule if request.url_rule else '(unmatched)'
+        labels = (('route', route), ('method', request.method))
+
+        registry.observe('http_request_duration_seconds', elapsed, labels)
+        registry.inc('http_requests_total', labels + (('status', str(response.status_code)),))
+        registry.observe('db_queries_per_request', query_count, labels, QUERY_COUNT_BUCKETS)
+        registry.summarize('db_query_duration_seconds', query_time, labels)
+        # Never materialize a streamed body just to measure it
+        size = None if response.is_streamed else response.calculate_content_length()
+        if size is not None:
+            registry.summarize('http_response_size_bytes', size, labels)
+
+        slow_ms = app.config['METRICS_SLOW_REQUEST_MS']
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            app.logger.warning('Slow request %s %s -> %s: %.0f ms, %d queries (%.0f ms SQL), %s bytes',
+                               request.method, request.full_path.rstrip('?'), response.status_code,
+                               elapsed * 1000, query_count, query_time * 1000,
+                               size if size is not None else 'streamed')
+        return response
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
@@ -0,0 +1,108 @@
+"""
+Schema migrations for existing databases.
+
+db.create_all() only creates missing tables: it never adds columns or
+indexes to a table that already exists. Every step below inspects the live
+schema first, so migrate_db() is idempotent and safe to run on each deploy.
+"""
+
+from datetime import date
+
+from sqlalchemy import Float, inspect, text
+
+from models import db, Category, Person, Task, Note
+from search import install_search_index
+
+
+def _has_index(conn, table, name):
+    return any(ix['name'] == name for ix in inspect(conn).get_indexes(table))
+
+
+def _add_column(conn, model, name):
+    """ALTER TABLE ADD COLUMN for a model column missing from the live table."""
+    table = model.__tablename__
+    if any(c['name'] == name for c in inspect(conn).get_columns(table)):
+        return False
+    column = model.__table__.c[name]
+    ddl = f'ALTER TABLE {table} ADD COLUMN {name} {column.type.compile(dialect=conn.dialect)}'
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += ' NOT NULL'
+    conn.execute(text(ddl))
+    return True
+
+
+def _create_index(conn, model, name):
+    """Create one of the model's declared indexes if it is missing."""
+    index = next(ix for ix in model.__table__.indexes if ix.name == name)
+    index.create(conn, checkfirst=True)
+
+
+def note_task_date_unique(conn):
+    """Merge duplicate (task_id, date) notes, then add the unique index."""
+    if _has_index(conn, 'note', 'ix_note_task_date'):
+        return
+    # The old read-then-write upsert always updated the first matching row,
+    # so the lowest id is the copy the app has been reading and writing.
+    conn.execute(text("""
+        DELETE FROM note WHERE id NOT IN (
+            SELECT MIN(id) FROM note GROUP BY task_id, date
+        )
+    """))
+    _create_index(conn, Note, 'ix_note_task_date')
+
+
+def revision_columns(conn):
+    """Add the change-tracking rev column (and its index) to tracked tables."""
+    for model in (Category, Person, Task, Note):
+        _add_column(conn, model, 'rev')
+        _create_index(conn, model, f'ix_{model.__tablename__}_rev')
+
+
+def note_date_index(conn):
+    """Index Note.date for the week-range filter in get_notes."""
+    _create_index(conn, Note, 'ix_note_date')
+
+
+def fractional_order(conn):
+    """Float order columns (SQLite stores REAL in them as is) plus their indexes."""
+    if conn.dialect.name != 'sqlite':
+        for table in ('category', 'task'):
+            column = next(c for c in inspect(conn).get_columns(table) if c['name'] == 'order')
+            if not isinstance(column['type'], Float):
+                conn.execute(text(f'ALTER TABLE {table} ALTER COLUMN "order" TYPE DOUBLE PRECISION'))
+    _create_index(conn, Category, 'ix_category_order')
+    _create_index(conn, Task, 'ix_task_category_order')
+
+
+def task_done_on(conn):
+    """Add Task.done_on and its index for the archive sweep."""
+    if _add_column(conn, Task, 'done_on'):
+        # Completion dates were never recorded: start the archive clock now
+        conn.execute(text("UPDATE task SET done_on = :today WHERE done = :done AND done_on IS NULL"),
+                     {'today': date.today().isoformat(), 'done': True})
+    _create_index(conn, Task, 'ix_task_done')
+
+
+def fulltext_search(conn):
+    """FTS5 index over task text and note content (SQLite only)."""
+    install_search_index(conn)
+
+
+MIGRATIONS = [
+    note_task_date_unique,
+    revision_columns,
+    note_date_index,
+    fractional_order,
+    task_done_on,
+    fulltext_search,
+]
+
+
+def migrate_db():
+    """Create missing tables, then bring existing ones up to date."""
+    db.create_all()
+    with db.engine.begin() as conn:
+        for step in MIGRATIONS:
+            step(conn)
@@ -1,63 +1,213 @@
+from datetime import date
+
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import relationship
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, relationship
 
 db = SQLAlchemy()
 
-class Category(db.Model):
+
+def upsert_insert(model):
+    """INSERT construct supporting on_conflict_do_update for the bound dialect."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+# --- Change tracking ---
+# Every commit that touches a tracked row bumps the board revision and stamps
+# the row with it; deletes leave a Tombstone. /api/changes?since=<rev> then
+# only has to look at rows with rev > since.
+
+class BoardState(db.Model):
+    """Single-row table holding the board revision counter."""
+    id = db.Column(db.Integer, primary_key=True)
+    rev = db.Column(db.Integer, nullable=False, default=0)
+    # Revision of the last wholesale replacement (restore); clients that
+    # synced before it must reload everything.
+    reset_rev = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Tombstone(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False) # table name of the deleted row
+    entity_id = db.Column(db.Integer, nullable=False)
+    rev = db.Column(db.Integer, nullable=False, index=True)
+
+
+class Revisioned:
+    """Mixin for models whose changes are reported by /api/changes."""
+    rev = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+
+
+# --- Serialization ---
+# Each model lists the columns its to_dict() exposes. Read-only listings use
+# row_dicts(), which selects just those columns and zips the tuples into
+# dicts, skipping ORM object hydration and identity-map bookkeeping.
+
+def row_dicts(model, *criteria, order_by=None, stmt=None):
+    """Same dicts as [o.to_dict() for o in ...], built from plain result rows.
+
+    Pass `stmt` (from row_select) to add joins, limits or execution options.
+    """
+    if stmt is None:
+        stmt = row_select(model).where(*criteria)
+        if order_by is not None:
+            stmt = stmt.order_by(*order_by)
+    fields = model.dict_fields
+    return [dict(zip(fields, row)) for row in db.session.execute(stmt)]
+
+
+def row_select(model):
+    """SELECT of model's dict_fields columns, for use with row_dicts(stmt=...)."""
+    return db.select(*(getattr(model, f) for f in model.dict_fields))
+
+
+def current_revision(session=None):
+    """Return (rev, reset_rev) for the board."""
+    session = session or db.session
+    row = session.execute(db.select(BoardState.rev, BoardState.reset_rev).filter_by(id=1)).first()
+    return (row.rev, row.reset_rev) if row else (0, 0)
+
+
+def next_revision(session=None):
+    """Bump the board revision inside the current transaction and return it."""
+    session = session or db.session
+    table = BoardState.__table__
+    rev = session.execute(
+        table.update().where(table.c.id == 1).values(rev=table.c.rev + 1).returning(table.c.rev)
+    ).scalar()
+    if rev is None:
+        rev = 1
+        session.execute(table.insert().values(id=1, rev=rev, reset_rev=0))
+    session.info['pending_rev'] = rev  # announced by events.py once committed
+    return rev
+
+
+def reset_revision(session=None):
+    """Record a wholesale replacement of the board; old tombstones become moot."""
+    session = session or db.session
+    rev = next_revision(session)
+    session.execute(BoardState.__table__.update().where(BoardState.id == 1).values(reset_rev=rev))
+    session.execute(Tombstone.__table__.delete())
+    return rev
+
+
+@event.listens_for(Session, 'before_flush')
+def _stamp_revisions(session, flush_context, instances):
+    changed = [o for o in session.new if isinstance(o, Revisioned)]
+    changed += [o for o in session.dirty if isinstance(o, Revisioned) and session.is_modified(o)]
+    deleted = [o for o in session.deleted if isinstance(o, Revisioned)]
+    if not changed and not deleted:
+        return
+
+    rev = next_revision(session)
+    for obj in changed:
+        obj.rev = rev
+    for obj in deleted:
+        session.add(Tombstone(entity=obj.__tablename__, entity_id=obj.id, rev=rev))
+
+
+class Category(Revisioned, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     color = db.Column(db.String(50), nullable=False) # css class or hex
-    order = db.Column(db.Integer, default=0)
+    order = db.Column(db.Float, default=0, index=True) # sparse, see ordering.py
     tasks = relationship('Task', backref='category', cascade="all, delete-orphan", order_by='Task.order')
 
+    dict_fields = ('id', 'name', 'color', 'order')
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'color': self.color,
-            'order': self.order
-        }
+        return {f: getattr(self, f) for f in self.dict_fields}
 
-class Person(db.Model):
+class Person(Revisioned, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     tasks = relationship('Task', backref='person')
 
+    dict_fields = ('id', 'name')
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name
-        }
+        return {f: getattr(self, f) for f in self.dict_fields}
+
+class Task(Revisioned, db.Model):
+    __table_args__ = (
+        db.Index('ix_task_category_order', 'category_id', 'order'),
+        db.Index('ix_task_done', 'done', 'done_on'),  # active filter + archive sweep
+    )
 
-class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
     person_id = db.Column(db.Integer, db.ForeignKey('person.id'), nullable=True)
     text = db.Column(db.String(500), nullable=False)
     done = db.Column(db.Boolean, default=False)
-    order = db.Column(db.Integer, default=0)
+    done_on = db.Column(db.String(10), nullable=True) # YYYY-MM-DD, set with done
+    order = db.Column(db.Float, default=0) # sparse, see ordering.py
     notes = relationship('Note', backref='task', cascade="all, delete-orphan")
 
+    dict_fields = ('id', 'category_id', 'person_id', 'text', 'done', 'done_on', 'order')
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'category_id': self.category_id,
-            'person_id': self.person_id,
-            'text': self.text,
-            'done': self.done,
-            'order': self.order
-        }
+        return {f: getattr(self, f) for f in self.dict_fields}
+
+class Note(Revisioned, db.Model):
+    # One note per task per day; upsert_note relies on this for ON CONFLICT
+    __table_args__ = (
+        db.Index('ix_note_task_date', 'task_id', 'date', unique=True),
+    )
 
-class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
+    date = db.Column(db.String(10), nullable=False, index=True) # YYYY-MM-DD
+    content = db.Column(db.Text, nullable=True)
+
+    dict_fields = ('id', 'task_id', 'date', 'content')
+
+    def to_dict(self):
+        return {f: getattr(self, f) for f in self.dict_fields}
+
+
+# active_history loads the old value of an expired instance first, so a
+# commit in between does not hide the change
+@event.listens_for(Task.done, 'set', active_history=True)
+def _stamp_done_on(task, value, oldvalue, initiator):
+    if bool(value) != bool(oldvalue):
+        task.done_on = date.today().isoformat() if value else None
+
+
+# --- Archive ---
+# Tasks done for more than ARCHIVE_AFTER_DAYS move here with their notes
+# (see archive.py). Category and person names are copied because either may
+# be deleted later. The board ids are kept for reference only: SQLite may hand
+# a freed id to a new task, so archive rows have their own keys.
+
+class ArchivedTask(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False, index=True) # id on the board
+    category_id = db.Column(db.Integer, nullable=False, index=True)
+    category_name = db.Column(db.String(100), nullable=True)
+    person_id = db.Column(db.Integer, nullable=True)
+    person_name = db.Column(db.String(100), nullable=True)
+    text = db.Column(db.String(500), nullable=False)
+    order = db.Column(db.Float, default=0)
+    done_on = db.Column(db.String(10), nullable=True, index=True)
+    archived_on = db.Column(db.String(10), nullable=False)
+    notes = relationship('ArchivedNote', backref='task', cascade="all, delete-orphan")
+
+    dict_fields = ('id', 'task_id', 'category_id', 'category_name', 'person_id', 'person_name',
+                   'text', 'order', 'done_on', 'archived_on')
+
+    def to_dict(self):
+        return {f: getattr(self, f) for f in self.dict_fields}
+
+class ArchivedNote(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    archived_task_id = db.Column(db.Integer, db.ForeignKey('archived_task.id'), nullable=False, index=True)
     date = db.Column(db.String(10), nullable=False) # YYYY-MM-DD
     content = db.Column(db.Text, nullable=True)
 
+    dict_fields = ('id', 'archived_task_id', 'date', 'content')
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'task_id': self.task_id,
-            'date': self.date,
-            'content': self.content
-        }
+        return {f: getattr(self, f) for f in self.dict_fields}
@@ -0,0 +1,107 @@
+"""
+Sparse fractional ordering for tasks and categories.
+
+Rows are appended ORDER_GAP apart, and a move sets the moved row's order to
+the midpoint of its new neighbours, so it writes exactly one row. Halving
+a gap works ~50 times before doubles run out of precision; once a gap falls
+under MIN_ORDER_GAP the scope (one category's tasks, or all categories) is
+respaced by a background pass, and a move whose midpoint would collide with
+a neighbour respaces synchronously first.
+"""
+
+import threading
+
+from models import db, Task
+
+ORDER_GAP = 1024.0
+MIN_ORDER_GAP = 1e-6
+
+
+def order_scope(model, category_id=None):
+    """Filters selecting the rows that share one ordering."""
+    if model is Task:
+        return [Task.category_id == category_id]
+    return []
+
+
+def next_order(model, scope):
+    """Order value for a row appended at the end (index-backed MAX)."""
+    max_order = db.session.query(db.func.max(model.order)).filter(*scope).scalar()
+    return (max_order or 0) + ORDER_GAP
+
+
+def _neighbours(model, scope, exclude_id, before=None, after=None):
+    siblings = db.session.query(model).filter(*scope, model.id != exclude_id)
+    if after is not None:
+        lo = after.order
+        hi = siblings.filter(model.order > lo).with_entities(db.func.min(model.order)).scalar()
+    elif before is not None:
+        hi = before.order
+        lo = siblings.filter(model.order < hi).with_entities(db.func.max(model.order)).scalar()
+    else:
+        lo = siblings.with_entities(db.func.max(model.order)).scalar()
+        hi = None
+    return lo, hi
+
+
+def _between(lo, hi):
+    if lo is None and hi is None:
+        return ORDER_GAP, float('inf')
+    if hi is None:
+        return lo + ORDER_GAP, float('inf')
+    if lo is None:
+        return hi - ORDER_GAP, float('inf')
+    return (lo + hi) / 2, hi - lo
+
+
+def move_row(model, row, scope, before=None, after=None):
+    """
+    Give row an order right after `after`, right before `before`, or at the
+    end of scope. Returns True when the scope is due for a rebalance.
+    """
+    lo, hi = _neighbours(model, scope, row.id, before, after)
+    order, gap = _between(lo, hi)
+    if (lo is not None and order <= lo) or (hi is not None and order >= hi):
+        # Out of precision between these two: respace now and retry
+        rebalance(model, scope)
+        db.session.flush()
+        lo, hi = _neighbours(model, scope, row.id, before, after)
+        order, gap = _between(lo, hi)
+    row.order = order
+    return gap < MIN_ORDER_GAP
+
+
+def rebalance(model, scope):
+    """Respace every row in scope ORDER_GAP apart, keeping their sequence."""
+    rows = db.session.query(model).filter(*scope).order_by(model.order, model.id).all()
+    for i, row in enumerate(rows, 1):
+        if row.order != i * ORDER_GAP:
+            row.order = i * ORDER_GAP
+
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def schedule_rebalance(app, model, category_id=None):
+    """Rebalance one scope in a background thread (at most one queued per scope)."""
+    key = (model.__tablename__, category_id)
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+
+    def run():
+        try:
+            with app.app_context():
+                rebalance(model, order_scope(model, category_id))
+                db.session.commit()
+        except Exception:
+            app.logger.exception('Order rebalance failed for %s', key)
+        finally:
+            with _pending_lock:
+                _pending.discard(key)
+
+    thread = threading.Thread(target=run, name=f'rebalance-{key[0]}-{key[1]}', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,119 @@
+"""
+LRU cache for rendered PDF exports.
+
+Entries are keyed on everything the document depends on: the week shown and
+the board revision (every write bumps it, see models.next_revision). A repeat
+request for an unchanged board is then served without touching ReportLab.
+Entries live in memory, and optionally on disk so they survive worker
+restarts and are shared between workers on the same host.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class PdfCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_entries=64, directory=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_bytes=config['PDF_CACHE_MAX_BYTES'],
+            max_entries=config['PDF_CACHE_MAX_ENTRIES'],
+            directory=config['PDF_CACHE_DIR'],
+        )
+
+    @staticmethod
+    def make_key(*parts):
+        return hashlib.sha1('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+        data = self._read_disk(key)
+        if data is not None:
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        self._remember(key, data)
+        self._write_disk(key, data)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pdf'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _remember(self, key, data):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    # --- Disk tier ---
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pdf')
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(self._path(key))  # mtime doubles as the LRU clock
+        return data
+
+    def _write_disk(self, key, data):
+        if not self.directory:
+            return
+        tmp = self._path(key) + f'.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        self._trim_disk()
+
+    def _trim_disk(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pdf'):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue  # trimmed by another worker
+                files.append((st.st_mtime, st.st_size, name))
+        files.sort(reverse=True)
+        total = 0
+        for i, (_, size, name) in enumerate(files):
+            total += size
+            if total > self.max_bytes or i >= self.max_entries:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
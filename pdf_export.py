@@ -0,0 +1,261 @@
+"""
+Weekly PDF rendering with ReportLab.
+
+ReportLab takes longer to import than anything else the app needs, and
+only the export uses it, so app.py imports this module on the first render
+instead of at start-up: restarted workers serve /api/init without paying
+for it, and cache hits never load it at all. Process-pool jobs import it
+directly rather than the whole app.
+
+The paragraph styles are built on first use and shared by every later
+render in the process; ReportLab only reads them during a build.
+
+Batch exports (several weeks, optionally one document per person) render
+their documents in a process pool into a ZIP, or as one combined PDF with
+an outline entry per week and person.
+"""
+
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import Flowable, PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+from metrics import metrics
+
+MONTH_NAMES = ["JANUARY", "FEBRUARY", "MARCH", "APRIL", "MAY", "JUNE",
+               "JULY", "AUGUST", "SEPTEMBER", "OCTOBER", "NOVEMBER", "DECEMBER"]
+# Python weekday(): Monday=0 ... Sunday=6, so order must start at Monday
+DAYS_SHORT = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+@lru_cache(maxsize=None)
+def pdf_styles():
+    """The ParagraphStyles of the weekly export, keyed by role."""
+    styles = getSampleStyleSheet()
+    return {
+        'month': ParagraphStyle(
+            'MonthStyle',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#d63384'),
+            spaceAfter=4,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'week': ParagraphStyle(
+            'WeekStyle',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=colors.darkgray,
+            spaceAfter=20,
+            alignment=TA_CENTER
+        ),
+        'heading': ParagraphStyle(
+            'HeadingStyle',
+            parent=styles['Heading3'],
+            fontSize=13,
+            textColor=colors.black,
+            spaceAfter=12,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'category': ParagraphStyle(
+            'CategoryStyle',
+            parent=styles['Heading3'],
+            fontSize=12,
+            textColor=colors.black,
+            spaceAfter=8,
+            spaceBefore=12,
+            fontName='Helvetica-Bold',
+            leftIndent=0
+        ),
+        'task': ParagraphStyle(
+            'TaskStyle',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.black,
+            leftIndent=20,
+            spaceAfter=4
+        ),
+        'note': ParagraphStyle(
+            'NoteStyle',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.HexColor('#3498db'),
+            leftIndent=20
+        ),
+        'footer': ParagraphStyle(
+            'FooterStyle',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.gray,
+            alignment=TA_CENTER,
+            spaceBefore=20
+        ),
+    }
+
+
+def _story(week_start, sections, heading=None):
+    """The flowables of one weekly document."""
+    week_end = week_start + timedelta(days=6)
+    styles = pdf_styles()
+    elements = []
+
+    # Header with just Month and Week
+    month_text = f"{MONTH_NAMES[week_start.month - 1]} {week_start.year}"
+    elements.append(Paragraph(month_text, styles['month']))
+    week_text = (f"{DAYS_SHORT[week_start.weekday()]} {week_start.day} - "
+                 f"{DAYS_SHORT[week_end.weekday()]} {week_end.day}")
+    elements.append(Paragraph(week_text, styles['week']))
+    if heading:
+        elements.append(Paragraph(escape(heading), styles['heading']))
+
+    # Content - Categories and Tasks (only not done, see collect_pdf_sections)
+    for section in sections:
+        # Category header
+        elements.append(Paragraph(section['name'].upper(), styles['category']))
+
+        for task in section['tasks']:
+            # Task line with WHO? and text
+            task_text = f"<b>[{task['who']}]</b> {task['text']}"
+            elements.append(Paragraph(task_text, styles['task']))
+
+            # Note previews for this task
+            for note_date_str, content in task['notes']:
+                note_date = datetime.strptime(note_date_str, '%Y-%m-%d')
+                day_name = DAYS_SHORT[note_date.weekday()]
+                note_text = f"({day_name} {note_date.day}) {content}"
+                elements.append(Paragraph(note_text, styles['note']))
+
+            elements.append(Spacer(1, 0.1*inch))
+
+    # Footer - App name small at bottom
+    elements.append(Spacer(1, 0.3*inch))
+    elements.append(Paragraph("SEB OPS SYSTEM v5", styles['footer']))
+    return elements
+
+
+def _build(elements):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter,
+                            topMargin=0.5*inch, bottomMargin=0.5*inch,
+                            leftMargin=0.75*inch, rightMargin=0.75*inch)
+    with metrics.timer('pdf_build_seconds'):
+        doc.build(elements)
+    return buffer.getvalue()
+
+
+def render_pdf(week_start, sections, heading=None):
+    """Build the weekly PDF for collect_pdf_sections() output and return its bytes."""
+    return _build(_story(week_start, sections, heading))
+
+
+class _Bookmark(Flowable):
+    """Zero-size flowable that adds an outline entry pointing at its page."""
+
+    def __init__(self, title, level):
+        super().__init__()
+        self.title = title
+        self.level = level
+        self.width = self.height = 0
+
+    def draw(self):
+        key = f'b{id(self)}'
+        self.canv.bookmarkPage(key)
+        self.canv.addOutlineEntry(self.title, key, level=self.level)
+
+
+def _render_document(document):
+    return render_pdf(document['week_start'], document['sections'], document.get('heading'))
+
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+
+def _get_batch_pool(workers):
+    """
+    The process pool for batch renders, started on first use and kept.
+
+    Workers are spawned rather than forked: a fork of the threaded server
+    copies every lock as it is at that instant, and a child inheriting one
+    held by another request thread (metrics._lock, say) deadlocks on it.
+    Keeping the pool pays the spawn and ReportLab import once per process.
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(max_workers=workers,
+                                              mp_context=multiprocessing.get_context('spawn'))
+        return _batch_pool
+
+
+def render_batch(documents, workers=1):
+    """
+    render_pdf() every collect_pdf_batch() document; returns the PDFs in order.
+
+    With workers > 1 the builds are spread over a process pool: each one is
+    pure CPU work in ReportLab, which threads would serialize on the GIL.
+    """
+    global _batch_pool
+    if workers <= 1 or len(documents) <= 1:
+        return [_render_document(d) for d in documents]
+    pool = _get_batch_pool(workers)
+    try:
+        return list(pool.map(_render_document, documents))
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for the next request
+        with _batch_pool_lock:
+            if _batch_pool is pool:
+                _batch_pool = None
+        raise
+
+
+def render_combined(documents):
+    """
+    One PDF holding every document, each from a new page.
+
+    The outline (bookmarks pane) lists the weeks and, under each, the
+    document headings.
+    """
+    elements = []
+    last_week = None
+    for document in documents:
+        if elements:
+            elements.append(PageBreak())
+        week_start = document['week_start']
+        if week_start != last_week:
+            week_end = week_start + timedelta(days=6)
+            elements.append(_Bookmark(f"{week_start:%Y-%m-%d} - {week_end:%Y-%m-%d}", 0))
+            last_week = week_start
+        if document.get('heading'):
+            elements.append(_Bookmark(document['heading'], 1))
+        elements.extend(_story(week_start, document['sections'], document.get('heading')))
+    return _build(elements)
+
+
+def zip_documents(documents, pdfs):
+    """ZIP archive of the rendered documents, one <name>.pdf entry each."""
+    buffer = BytesIO()
+    seen = set()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for document, pdf in zip(documents, pdfs):
+            name, n = document['name'], 1
+            while name in seen:
+                n += 1
+                name = f"{document['name']}-{n}"
+            seen.add(name)
+            archive.writestr(f'{name}.pdf', pdf)
+    return buffer.getvalue()
@@ -0,0 +1,126 @@
+"""
+Background PDF rendering jobs.
+
+doc.build() can take seconds on a large board; running it on the request
+thread stalls a worker. A job runs the render in a thread or process pool
+while the client polls for its status and then downloads the result.
+Identical requests (same cache key) that are still in flight or finished
+within the TTL share one job.
+"""
+
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class PdfJob:
+    def __init__(self, key, future):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.future = future
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def status(self):
+        if self.future.done():
+            return 'failed' if self.future.exception() else 'done'
+        return 'running' if self.future.running() else 'queued'
+
+    @property
+    def result(self):
+        return self.future.result()
+
+    def to_dict(self):
+        data = {'id': self.id, 'status': self.status, 'created_at': self.created_at,
+                'finished_at': self.finished_at}
+        if data['status'] == 'failed':
+            data['error'] = str(self.future.exception())
+        return data
+
+
+class PdfJobQueue:
+    def __init__(self, max_workers=2, ttl=600, executor='thread'):
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.executor_kind = executor
+        self._executor = None
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_workers=config['PDF_JOB_WORKERS'],
+            ttl=config['PDF_JOB_TTL'],
+            executor=config['PDF_JOB_EXECUTOR'],
+        )
+
+    def _get_executor(self):
+        # Created on first use so importing the app does not spawn workers.
+        # Processes are spawned, not forked: a fork of the threaded server
+        # can inherit a lock another thread holds and deadlock on it.
+        if self._executor is None:
+            if self.executor_kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def submit(self, key, fn, *args, on_done=None):
+        """Run fn(*args) in the pool, or return the live job already running it."""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(self._by_key.get(key))
+            if job is not None and job.status != 'failed':
+                return job
+
+            job = PdfJob(key, self._get_executor().submit(fn, *args))
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+
+        def finished(future):
+            job.finished_at = time.time()
+            if on_done is not None and not future.exception():
+                on_done(future.result())
+        job.future.add_done_callback(finished)
+        return job
+
+    def completed(self, key, result):
+        """A job that is already done with `result` (a cache hit), without
+        going through the pool; a live job for the same key is reused."""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(self._by_key.get(key))
+            if job is not None and job.status != 'failed':
+                return job
+
+            future = Future()
+            future.set_result(result)
+            job = PdfJob(key, future)
+            job.finished_at = job.created_at
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,198 @@
+"""
+Opt-in per-request profiling.
+
+With PROFILER_ENABLED set, a request carrying an `X-Profile: 1` header or
+a `profile=1` query parameter runs under a profiler: pyinstrument (a
+sampling profiler, HTML report) when it is installed, cProfile otherwise
+(`profile=cprofile` forces it). The result goes to PROFILER_DIR, which is
+a ring buffer of at most PROFILER_MAX_PROFILES captures, and the response
+names it in X-Profile-Id. /api/admin/profiles lists and downloads them.
+
+When the flag is off the WSGI app is not wrapped at all, so requests pay
+nothing. Only one request is profiled at a time (cProfile cannot nest
+across threads); others are served normally with `X-Profile: busy`.
+The response body is read to the end inside the profiler, so streamed
+exports are measured in full. That includes /api/stream (when enabled):
+it ends after one event or EVENT_STREAM_LIFETIME, and mostly shows time
+spent waiting for a commit, holding the profiler until then.
+"""
+
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs
+
+try:
+    import pyinstrument
+except ImportError:  # optional dependency
+    pyinstrument = None
+
+FORMATS = {'cprofile': '.prof', 'pyinstrument': '.html'}
+
+
+class ProfileStore:
+    def __init__(self, directory, max_profiles=20):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['PROFILER_DIR'], config['PROFILER_MAX_PROFILES'])
+
+    def save(self, data, meta):
+        """Write one capture and drop the oldest beyond max_profiles; returns its id."""
+        # Millisecond timestamp first so names sort oldest to newest
+        profile_id = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+        meta = {**meta, 'id': profile_id, 'size': len(data)}
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(profile_id, meta['format']), 'wb') as f:
+                f.write(data)
+            with open(self._path(profile_id, 'meta'), 'w') as f:
+                json.dump(meta, f)
+            for old in self._ids()[:-self.max_profiles]:
+                for name in os.listdir(self.directory):
+                    if name.startswith(old + '.'):
+                        os.remove(os.path.join(self.directory, name))
+        return profile_id
+
+    def list(self):
+        """Metadata of stored captures, newest first."""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(self._path(profile_id, 'meta')) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # pruned or half-written meanwhile
+        return profiles
+
+    def get(self, profile_id):
+        """(meta, path of the capture) or None."""
+        if profile_id not in self._ids():
+            return None
+        with open(self._path(profile_id, 'meta')) as f:
+            meta = json.load(f)
+        return meta, self._path(profile_id, meta['format'])
+
+    def _ids(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.meta')] for name in names if name.endswith('.meta'))
+
+    def _path(self, profile_id, kind):
+        suffix = '.meta' if kind == 'meta' else FORMATS[kind]
+        return os.path.join(self.directory, profile_id + suffix)
+
+
+def profile_as_text(path, limit=60):
+    """Top cumulative-time entries of a cProfile capture, as pstats prints them."""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+class ProfilerMiddleware:
+    def __init__(self, wsgi_app, store):
+        self.wsgi_app = wsgi_app
+        self.store = store
+        self._busy = threading.Lock()
+
+    def _requested(self, environ):
+        if environ.get('HTTP_X_PROFILE') == '1':
+            return 'default'
+        if 'profile=' not in environ.get('QUERY_STRING', ''):
+            return None
+        value = parse_qs(environ['QUERY_STRING']).get('profile', [''])[0]
+        if value == 'cprofile':
+            return 'cprofile'
+        return 'default' if value == '1' else None
+
+    def __call__(self, environ, start_response):
+        requested = self._requested(environ)
+        if requested is None:
+            return self.wsgi_app(environ, start_response)
+        if not self._busy.acquire(blocking=False):
+            return self.wsgi_app(environ, _add_header(start_response, 'X-Profile', 'busy'))
+        try:
+            return self._profile(environ, start_response, requested)
+        finally:
+            self._busy.release()
+
+    def _profile(self, environ, start_response, requested):
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured['status'], captured['headers'], captured['exc_info'] = status, headers, exc_info
+            return lambda data: captured.setdefault('written', []).append(data)
+
+        use_pyinstrument = pyinstrument is not None and requested == 'default'
+        profiler = pyinstrument.Profiler() if use_pyinstrument else cProfile.Profile()
+        start = time.perf_counter()
+        if use_pyinstrument:
+            profiler.start()
+        else:
+            profiler.enable()
+        try:
+            # The body is read inside the profiler: streamed views do their work here
+            iterable = self.wsgi_app(environ, capture_start_response)
+            try:
+                body = list(iterable)
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+        finally:
+            if use_pyinstrument:
+                profiler.stop()
+            else:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        if use_pyinstrument:
+            fmt, data = 'pyinstrument', profiler.output_html().encode('utf-8')
+        else:
+            fmt, data = 'cprofile', _marshal_stats(profiler)
+        profile_id = self.store.save(data, {
+            'format': fmt,
+            'method': environ.get('REQUEST_METHOD'),
+            'path': environ.get('PATH_INFO'),
+            'query': environ.get('QUERY_STRING', ''),
+            'status': captured['status'],
+            'duration_ms': round(elapsed * 1000, 2),
+            'created_at': time.time(),
+        })
+
+        write = start_response(captured['status'], captured['headers'] + [('X-Profile-Id', profile_id)],
+                               captured['exc_info'])
+        for data in captured.get('written', []):
+            write(data)
+        return body
+
+
+def _marshal_stats(profile):
+    # Same bytes as Profile.dump_stats(), without the round trip through a file
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+def _add_header(start_response, name, value):
+    def wrapped(status, headers, exc_info=None):
+        return start_response(status, headers + [(name, value)], exc_info)
+    return wrapped
+
+
+def init_profiler(app):
+    """Wrap app.wsgi_app when PROFILER_ENABLED; returns the capture store."""
+    store = ProfileStore.from_config(app.config)
+    if app.config['PROFILER_ENABLED']:
+        app.wsgi_app = ProfilerMiddleware(app.wsgi_app, store)
+    return store
@@ -0,0 +1,168 @@
+"""
+Full-text search over task text and note content (SQLite FTS5).
+
+task_fts and note_fts are external-content FTS5 tables: they store only the
+index and read the text back from task / note, so nothing is duplicated.
+Triggers on the base tables keep them in sync for every write path (ORM
+flushes, the note upsert, restore's bulk inserts, the archive sweep's
+set-based deletes) without touching the routes.
+
+install_search_index() is a migration step; rebuild_search_index() is the
+`flask search-index` command for databases whose index is missing or
+suspect. Other database backends, and SQLite builds without FTS5, get no
+index and /api/search answers 501.
+"""
+
+import re
+import weakref
+from contextlib import contextmanager
+
+from sqlalchemy import Engine, text
+
+SNIPPET_TOKENS = 12
+
+# table -> (base table, indexed column)
+FTS_TABLES = {
+    'task_fts': ('task', 'text'),
+    'note_fts': ('note', 'content'),
+}
+
+
+def _ddl(fts, table, column):
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {column}, content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END""",
+    ]
+
+
+_fts5_builds = weakref.WeakKeyDictionary()  # engine -> FTS5 compiled in
+
+
+def search_available(bind):
+    """Whether `bind` (an Engine or a Connection) is SQLite built with FTS5."""
+    if bind.dialect.name != 'sqlite':
+        return False
+    engine = bind.engine
+    if engine not in _fts5_builds:
+        if isinstance(bind, Engine):
+            with engine.connect() as conn:
+                options = conn.exec_driver_sql('PRAGMA compile_options').scalars().all()
+        else:
+            options = bind.exec_driver_sql('PRAGMA compile_options').scalars().all()
+        _fts5_builds[engine] = 'ENABLE_FTS5' in options
+    return _fts5_builds[engine]
+
+
+def install_search_index(conn):
+    """Create the FTS tables and triggers where missing, then rebuild.
+
+    Triggers disappear with their base table (drop_all, a table rebuilt by
+    hand), which leaves the index stale, so any missing trigger means the
+    index is rebuilt from the base tables.
+    """
+    if not search_available(conn):
+        return False
+    existing = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars())
+    installed = False
+    for fts, (table, column) in FTS_TABLES.items():
+        if {f'{fts}_ai', f'{fts}_ad', f'{fts}_au'} <= existing:
+            continue
+        for statement in _ddl(fts, table, column):
+            conn.execute(text(statement))
+        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+        installed = True
+    return installed
+
+
+def rebuild_search_index(conn):
+    """Recreate the FTS tables and triggers from scratch and reindex."""
+    if not search_available(conn):
+        return False
+    for fts in FTS_TABLES:
+        for suffix in ('ai', 'ad', 'au'):
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {fts}_{suffix}'))
+        conn.execute(text(f'DROP TABLE IF EXISTS {fts}'))
+    return install_search_index(conn)
+
+
+@contextmanager
+def search_index_deferred(conn):
+    """
+    Skip per-row index maintenance for a bulk rewrite of the base tables.
+
+    The triggers are dropped and the index is rebuilt once at the end, which
+    is far cheaper than a 'delete' and an insert per row. SQLite DDL is
+    transactional, so if the block raises the caller's rollback brings the
+    triggers back, but only if a transaction is already open: the sqlite3
+    driver begins one implicitly before DML, never before DDL, and a DROP
+    TRIGGER run first would commit on its own. Emptying the index (about to
+    be rebuilt anyway) is that first DML.
+    """
+    if not search_available(conn):
+        yield
+        return
+    for fts in FTS_TABLES:
+        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('delete-all')"))
+    for fts in FTS_TABLES:
+        for suffix in ('ai', 'ad', 'au'):
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {fts}_{suffix}'))
+    yield
+    install_search_index(conn)
+
+
+def fts_query(raw):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    FTS5 has its own query syntax (AND/OR/NOT, column filters, quotes,
+    NEAR) and rejects malformed input with an error, so user text is never
+    passed through: every word becomes a quoted term, all of them must
+    match, and the last one also matches as a prefix (search as you type).
+    Returns None when there is nothing to search for.
+    """
+    words = re.findall(r'\w+', raw or '')
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+_TASK_HITS = f"""
+    SELECT 'task' AS kind, t.id AS id, t.id AS task_id, t.category_id AS category_id,
+           NULL AS date, t.text AS text,
+           snippet(task_fts, 0, :mark, :end_mark, '…', {SNIPPET_TOKENS}) AS snippet,
+           bm25(task_fts) AS rank
+    FROM task_fts JOIN task t ON t.id = task_fts.rowid
+    WHERE task_fts MATCH :query
+"""
+
+_NOTE_HITS = f"""
+    SELECT 'note' AS kind, n.id AS id, n.task_id AS task_id, t.category_id AS category_id,
+           n.date AS date, t.text AS text,
+           snippet(note_fts, 0, :mark, :end_mark, '…', {SNIPPET_TOKENS}) AS snippet,
+           bm25(note_fts) AS rank
+    FROM note_fts JOIN note n ON n.id = note_fts.rowid JOIN task t ON t.id = n.task_id
+    WHERE note_fts MATCH :query
+"""
+
+KINDS = {'task': _TASK_HITS, 'note': _NOTE_HITS}
+
+
+def search(session, query, kinds=('task', 'note'), limit=20, offset=0, marks=('<mark>', '</mark>')):
+    """Best-ranked hits (bm25, lower is better) for an fts_query() expression."""
+    sql = ' UNION ALL '.join(KINDS[k] for k in kinds) + ' ORDER BY rank, kind, id LIMIT :limit OFFSET :offset'
+    rows = session.execute(text(sql), {'query': query, 'limit': limit, 'offset': offset,
+                                       'mark': marks[0], 'end_mark': marks[1]})
+    return [dict(row._mapping) for row in rows]
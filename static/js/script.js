@@ -1,188 +1,614 @@
 document.addEventListener('DOMContentLoaded', () => {
-    // State
+    // State: a normalized copy of the board. Tasks and notes are kept by id
+    // so a change finds its data (and its row) without scanning the board.
     let state = {
-        categories: [],
+        categories: [],          // sorted by order, without their tasks
+        tasks: new Map(),        // task id -> task
+        categoryTasks: new Map(),// category id -> Set of task ids
         people: [],
-        notes: [],
+        notes: new Map(),        // task id -> Map(date -> note)
+        rev: 0,                  // board revision the local copy is synced to
+        noteWeeks: {},           // week key (Monday YYYY-MM-DD) -> load promise
         currentWeekStart: new Date(),
         doneTimestamps: {},      // track when tasks were marked done (client-side)
         expandedDone: {}         // per-category toggle for showing all done tasks
     };
 
     // DOM Elements
-    const matrixBody = document.getElementById('matrix-body');
+    const matrixTable = document.getElementById('matrix-table');
+    const scrollContainer = document.querySelector('.main-content');
     const monthYearDisplay = document.getElementById('month-year-display');
     const weekRangeDisplay = document.getElementById('week-range-display');
     const dayHeaders = document.querySelectorAll('.col-day');
 
-    // Init
-    init();
-
     function init() {
         state.currentWeekStart = new Date();
-        fetchInitData();
+        const bootstrap = readBootstrap();
+        if (bootstrap) showBootstrap(bootstrap);
+        else fetchInitData();
         setupEventListeners();
     }
 
+    // With BOARD_BOOTSTRAP the page already carries the /api/init snapshot
+    // and the first notes, so the board is drawn before any request is made.
+    function readBootstrap() {
+        const el = document.getElementById('board-bootstrap');
+        if (!el) return null;
+        try {
+            return JSON.parse(el.textContent);
+        } catch (error) {
+            console.error('Ignoring unreadable bootstrap data:', error);
+            return null;
+        }
+    }
+
+    function showBootstrap(data) {
+        setSnapshot(data);
+        // Server and browser may disagree on today's date (time zones): only
+        // trust the embedded notes when they cover the weeks we show
+        if (visibleWeeks().every(w => data.note_weeks.includes(w))) {
+            mergeNotes(data.notes);
+            data.note_weeks.forEach(w => { state.noteWeeks[w] = Promise.resolve(); });
+        }
+        renderMatrix();
+        fetchNotes().then(loaded => { if (loaded) renderMatrix(); });
+        prefetchAdjacentNotes();
+        openChangeStream();
+    }
+
+    // Conditional GET: remember each read endpoint's ETag and body, and send
+    // If-None-Match so an idle board answers with an empty 304. Callers get
+    // a fresh copy of the body because state objects are patched in place.
+    const etagCache = new Map();  // url -> { etag, data, headers }
+
+    async function fetchCached(url) {
+        const cached = etagCache.get(url);
+        const response = await fetch(url, {
+            cache: 'no-store',  // we revalidate ourselves
+            headers: cached ? { 'If-None-Match': cached.etag } : {}
+        });
+        if (response.status === 304 && cached) {
+            return { data: structuredClone(cached.data), headers: cached.headers };
+        }
+        if (!response.ok) throw new Error(`${url} failed: ${response.status}`);
+        const data = await response.json();
+        const etag = response.headers.get('ETag');
+        if (etag) etagCache.set(url, { etag, data: structuredClone(data), headers: response.headers });
+        return { data, headers: response.headers };
+    }
+
     async function fetchInitData() {
         try {
-            const response = await fetch('/api/init');
-            const data = await response.json();
-            state.categories = data.categories;
-            state.people = data.people;
+            const { data } = await fetchCached('/api/init');
+            setSnapshot(data);
             await fetchNotes();
             renderMatrix();
+            prefetchAdjacentNotes();
+            openChangeStream();
         } catch (error) {
             console.error('Error fetching init data:', error);
         }
     }
 
-    async function fetchNotes() {
+    // --- Store ---
+    function setSnapshot(data) {
+        state.rev = data.rev;
+        state.categories = data.categories.map(({ tasks, ...cat }) => cat);
+        state.tasks = new Map();
+        state.categoryTasks = new Map(state.categories.map(c => [c.id, new Set()]));
+        data.categories.forEach(cat => cat.tasks.forEach(putTask));
+        state.people = data.people;
+        state.notes = new Map();
+        state.noteWeeks = {};
+    }
+
+    // Returns the task it replaced, if any
+    function putTask(task) {
+        const previous = state.tasks.get(task.id);
+        if (previous && previous.category_id !== task.category_id) {
+            state.categoryTasks.get(previous.category_id)?.delete(task.id);
+        }
+        state.tasks.set(task.id, task);
+        if (!state.categoryTasks.has(task.category_id)) state.categoryTasks.set(task.category_id, new Set());
+        state.categoryTasks.get(task.category_id).add(task.id);
+        return previous;
+    }
+
+    function removeTask(id) {
+        const task = state.tasks.get(id);
+        if (!task) return null;
+        state.tasks.delete(id);
+        state.categoryTasks.get(task.category_id)?.delete(id);
+        state.notes.delete(id);
+        return task;
+    }
+
+    function tasksOf(categoryId) {
+        const ids = state.categoryTasks.get(categoryId) || [];
+        return [...ids].map(id => state.tasks.get(id)).sort((a, b) => a.order - b.order || a.id - b.id);
+    }
+
+    // Notes are keyed by task/date (locally saved notes may not have an id yet)
+    function getNote(taskId, date) {
+        const notes = state.notes.get(taskId);
+        return notes ? notes.get(date) : undefined;
+    }
+
+    function putNote(note) {
+        const taskId = Number(note.task_id);
+        if (!state.notes.has(taskId)) state.notes.set(taskId, new Map());
+        const notes = state.notes.get(taskId);
+        const existing = notes.get(note.date);
+        if (existing) Object.assign(existing, note, { task_id: taskId });
+        else notes.set(note.date, Object.assign({}, note, { task_id: taskId }));
+        return taskId;
+    }
+
+    // Returns the ids of the tasks whose notes changed
+    function mergeNotes(notes) {
+        return new Set(notes.map(putNote));
+    }
+
+    // Live updates (EVENT_STREAM_ENABLED): the server pushes an
+    // /api/changes-style delta over SSE when someone else commits, then ends
+    // the response. EventSource reconnects by itself and resumes from the
+    // last event id it saw.
+    let changeStream = null;
+
+    function openChangeStream() {
+        if (changeStream || !window.EventSource || !document.body.dataset.liveUpdates) return;
+        changeStream = new EventSource(`/api/stream?since=${state.rev}`);
+        changeStream.addEventListener('changes', event => {
+            const data = JSON.parse(event.data);
+            if (data.reset) {
+                if (data.rev !== state.rev) fetchInitData();
+                return;
+            }
+            if (data.rev <= state.rev) return;  // already synced after our own write
+            renderChanges(applyChanges(data));
+        });
+    }
+
+    // Pull only what changed since state.rev and patch the local copy.
+    // Falls back to a full reload when the server says the board was replaced.
+    async function syncChanges() {
         try {
-            const response = await fetch('/api/notes');
-            state.notes = await response.json();
+            const response = await fetch(`/api/changes?since=${state.rev}`);
+            const data = await response.json();
+            if (data.reset) {
+                await fetchInitData();
+                return;
+            }
+            renderChanges(applyChanges(data));
         } catch (error) {
-            console.error('Error fetching notes:', error);
+            console.error('Error syncing changes:', error);
+        }
+    }
+
+    // Patch the store and report what needs redrawing: the whole layout
+    // (categories or people changed), some sections, or single task rows.
+    function applyChanges(data) {
+        const deleted = data.deleted;
+        const dirty = { layout: false, categories: new Set(), tasks: new Set() };
+
+        // Categories (keep their task sets, re-sort by order)
+        if (data.categories.length || deleted.category.length) {
+            dirty.layout = true;
+            state.categories = state.categories.filter(c => !deleted.category.includes(c.id));
+            data.categories.forEach(cat => {
+                const existing = state.categories.find(c => c.id === cat.id);
+                if (existing) Object.assign(existing, cat);
+                else state.categories.push(Object.assign({}, cat));
+            });
+            state.categories.sort((a, b) => a.order - b.order || a.id - b.id);
+        }
+
+        // Tasks: each one dirties the sections it left and joined
+        deleted.task.forEach(id => {
+            const task = removeTask(id);
+            if (task) dirty.categories.add(task.category_id);
+        });
+        data.tasks.forEach(task => {
+            const previous = putTask(task);
+            if (previous) dirty.categories.add(previous.category_id);
+            dirty.categories.add(task.category_id);
+        });
+
+        // People (every row has a person picker)
+        if (data.people.length || deleted.person.length) {
+            dirty.layout = true;
+            state.people = state.people.filter(p => !deleted.person.includes(p.id));
+            data.people.forEach(person => {
+                const existing = state.people.find(p => p.id === person.id);
+                if (existing) Object.assign(existing, person);
+                else state.people.push(person);
+            });
+        }
+
+        if (deleted.note.length) {
+            const gone = new Set(deleted.note);
+            state.notes.forEach((notes, taskId) => notes.forEach((note, date) => {
+                if (gone.has(note.id)) {
+                    notes.delete(date);
+                    dirty.tasks.add(taskId);
+                }
+            }));
+        }
+        mergeNotes(data.notes).forEach(id => dirty.tasks.add(id));
+
+        state.rev = data.rev;
+        return dirty;
+    }
+
+    function renderChanges(dirty) {
+        if (dirty.layout) {
+            renderMatrix();
+            return;
         }
+        const days = visibleDays();
+        dirty.categories.forEach(id => renderSection(id, days));
+        dirty.tasks.forEach(id => {
+            const task = state.tasks.get(id);
+            if (task && !dirty.categories.has(task.category_id)) refreshTask(id, days);
+        });
+    }
+
+    // Notes are loaded one calendar week (Monday-based) at a time: the weeks
+    // the visible window touches first, then one week either side in the
+    // background so day-by-day navigation rarely has to wait.
+    function weekKey(date) {
+        return formatDate(addDays(date, -((date.getDay() + 6) % 7)));
+    }
+
+    function visibleWeeks() {
+        const start = state.currentWeekStart;
+        return [...new Set([weekKey(start), weekKey(addDays(start, 3))])];
+    }
+
+    function adjacentWeeks() {
+        const start = state.currentWeekStart;
+        return [weekKey(addDays(start, -7)), weekKey(addDays(start, 3 + 7))];
+    }
+
+    async function fetchNotes(weeks = visibleWeeks()) {
+        const missing = weeks.filter(w => !state.noteWeeks[w]).sort();
+        if (missing.length > 0) {
+            const load = fetchNotesRange(missing[0], formatDate(addDays(new Date(missing[missing.length - 1] + 'T12:00:00Z'), 6)));
+            missing.forEach(w => {
+                // Forget failed loads so the next navigation retries them
+                state.noteWeeks[w] = load.catch(error => {
+                    delete state.noteWeeks[w];
+                    console.error('Error fetching notes:', error);
+                });
+            });
+        }
+        await Promise.all(weeks.map(w => state.noteWeeks[w]));
+        return missing.length > 0;
+    }
+
+    async function fetchNotesRange(startDate, endDate) {
+        let after = null;
+        do {
+            let url = `/api/notes?start_date=${startDate}&end_date=${endDate}`;
+            if (after) url += `&after=${encodeURIComponent(after)}`;
+            const { data, headers } = await fetchCached(url);
+            mergeNotes(data);
+            after = headers.get('X-Next-After');
+        } while (after);
+    }
+
+    function prefetchAdjacentNotes() {
+        fetchNotes(adjacentWeeks());
+    }
+
+    async function showWeek(weekStart) {
+        state.currentWeekStart = weekStart;
+        renderMatrix();
+        if (await fetchNotes()) renderMatrix();
+        prefetchAdjacentNotes();
     }
 
     // --- Rendering ---
+    // One <tbody> per category. A section is built the first time it comes
+    // near the viewport; until then it is one placeholder row of about the
+    // right height. Built rows are kept by task id and patched in place:
+    // a redraw only writes the cells whose value changed.
+    const DAY_COLUMNS = 4;
+    const ROW_HEIGHT = 56;  // px, placeholder estimate per task row
+    const DAYS_SHORT = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'];
+    const sections = new Map();  // category id -> { tbody, built, index, rows, catCell, catKey, placeholder }
+
+    const sectionObserver = window.IntersectionObserver
+        ? new IntersectionObserver(entries => entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            sectionObserver.unobserve(entry.target);
+            buildSection(Number(entry.target.dataset.categoryId));
+        }), { root: scrollContainer, rootMargin: '600px 0px' })
+        : null;
+
+    function visibleDays() {
+        return Array.from({ length: DAY_COLUMNS }, (_, i) => formatDate(addDays(state.currentWeekStart, i)));
+    }
+
     function renderMatrix() {
         updateHeaderDates();
-        matrixBody.innerHTML = '';
+        const days = visibleDays();
+        const live = new Set();
+        let previous = null;
+        // New sections that start on screen are built right away: observer
+        // callbacks only arrive after the first paint
+        const eagerUntil = scrollContainer.scrollTop + scrollContainer.clientHeight;
+        let offset = 0;
 
         state.categories.forEach((cat, catIndex) => {
-            // Split tasks into not-done and done, then sort done by last checked time
-            const allTasks = cat.tasks;
-            const undoneTasks = allTasks.filter(t => !t.done);
-            const doneTasks = allTasks.filter(t => t.done);
-
-            const doneWithMeta = doneTasks.map(t => {
-                const ts = state.doneTimestamps[t.id] || 0;
-                return Object.assign({}, t, { _doneTime: ts });
-            });
+            live.add(cat.id);
+            let section = sections.get(cat.id);
+            if (!section) {
+                const tbody = document.createElement('tbody');
+                tbody.className = 'category-section';
+                tbody.dataset.categoryId = cat.id;
+                const built = !sectionObserver || offset < eagerUntil;
+                section = { tbody, built, rows: new Map(), catCell: null, catKey: null, placeholder: null };
+                sections.set(cat.id, section);
+                if (!built) sectionObserver.observe(tbody);
+            }
+            const taskIds = state.categoryTasks.get(cat.id);
+            offset += Math.max(taskIds ? taskIds.size : 0, 1) * ROW_HEIGHT;
+            section.index = catIndex;
+            // Keep sections in board order, moving only the ones out of place
+            const expected = previous ? previous.nextElementSibling : matrixTable.tHead.nextElementSibling;
+            if (section.tbody !== expected) matrixTable.insertBefore(section.tbody, expected);
+            previous = section.tbody;
+            renderSection(cat.id, days);
+        });
 
-            // Most recently checked first; tasks without timestamp fall to the bottom
-            doneWithMeta.sort((a, b) => b._doneTime - a._doneTime);
-
-            const showAllDone = !!state.expandedDone[cat.id];
-            const visibleDoneTasks = showAllDone ? doneWithMeta : doneWithMeta.slice(0, 3);
-
-            const tasks = [...undoneTasks, ...visibleDoneTasks];
-            const renderTasks = tasks.length > 0 ? tasks : [null];
-
-            renderTasks.forEach((task, index) => {
-                const tr = document.createElement('tr');
-                tr.className = catIndex % 2 === 0 ? 'row-even' : 'row-odd';
-
-                // Category Cell
-                if (index === 0) {
-                    const catCell = document.createElement('td');
-                    catCell.className = 'category-cell';
-                    catCell.rowSpan = renderTasks.length;
-                    const hasExtraDone = doneTasks.length > 3;
-                    const showAllDone = !!state.expandedDone[cat.id];
-
-                    catCell.innerHTML = `
-                        <div class="category-label" style="background-color: ${cat.color}; border-color: ${cat.color}" onclick="editCategory(${cat.id})">
-                            <span style="flex:1">${cat.name}</span>
-                            <span class="cat-controls" style="display:flex; gap:5px; align-items:center;">
-                                <i class="fas fa-chevron-up" style="cursor:pointer; opacity:0.7; font-size:0.8em;" onclick="event.stopPropagation(); moveCategory(${cat.id}, 'up')"></i>
-                                <i class="fas fa-chevron-down" style="cursor:pointer; opacity:0.7; font-size:0.8em;" onclick="event.stopPropagation(); moveCategory(${cat.id}, 'down')"></i>
-                                <i class="fas fa-pen" style="font-size: 0.8em; opacity: 0.5;"></i>
-                            </span>
-                        </div>
-                        <button class="add-task-btn" data-category-id="${cat.id}">+ ADD</button>
-                        ${hasExtraDone ? `<button class="toggle-done-btn" data-category-id="${cat.id}" style="margin-top:6px; font-size:10px; padding:3px 6px; background:transparent; border:1px solid var(--border-color); color:var(--text-muted); cursor:pointer;">${showAllDone ? '▲ LESS DONE' : '▼ MORE DONE'}</button>` : ''}
-                    `;
-                    // Attach event listener after rendering
-                    const addBtn = catCell.querySelector('.add-task-btn');
-                    if (addBtn) addBtn.addEventListener('click', () => window.addTask(cat.id));
-                    const toggleDoneBtn = catCell.querySelector('.toggle-done-btn');
-                    if (toggleDoneBtn) toggleDoneBtn.addEventListener('click', (e) => {
-                        e.stopPropagation();
-                        toggleDoneVisibility(cat.id);
-                    });
-                    tr.appendChild(catCell);
-                }
+        sections.forEach((section, id) => {
+            if (live.has(id)) return;
+            if (sectionObserver) sectionObserver.unobserve(section.tbody);
+            section.tbody.remove();
+            sections.delete(id);
+        });
+    }
 
-                // Who Cell
-                const whoCell = document.createElement('td');
-                whoCell.innerHTML = renderPersonSelect(task);
-                tr.appendChild(whoCell);
-
-                // Task Cell
-                const taskCell = document.createElement('td');
-                let taskNotesHtml = '';
-
-                if (task) {
-                    // Collect ALL notes for this task (across all dates)
-                    const daysShort = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'];
-                    const taskNotes = state.notes
-                        .filter(n => n.task_id === task.id && n.content && n.content.trim() !== '')
-                        .sort((a, b) => a.date.localeCompare(b.date));
-
-                    taskNotes.forEach(note => {
-                        // note.date is in YYYY-MM-DD format
-                        const [year, month, day] = note.date.split('-').map(Number);
-                        const jsDate = new Date(year, month - 1, day);
-                        const dayName = daysShort[jsDate.getDay()];
-                        taskNotesHtml += `
-                            <div class="task-note-preview">
-                                <span class="note-date">(${dayName} ${jsDate.getDate()})</span>
-                                ${note.content}
-                                <span class="note-delete" onclick="deleteNote(${task.id}, '${note.date}')" style="margin-left:6px; cursor:pointer; color:#666;">&times;</span>
-                            </div>
-                        `;
-                    });
-
-                    taskCell.innerHTML = `
-                        <div class="task-input-container">
-                            <div class="task-main-row">
-                                <input type="checkbox" class="task-checkbox" ${task.done ? 'checked' : ''} onchange="toggleTask(${task.id}, this.checked)">
-                                <textarea class="task-text-input ${task.done ? 'done' : ''}" onblur="updateTaskText(${task.id}, this.value)" rows="1">${task.text}</textarea>
-                                <i class="fas fa-trash" data-task-id="${task.id}" style="cursor:pointer; color:#444; font-size:10px;"></i>
-                            </div>
-                            <div class="task-notes-container">
-                                ${taskNotesHtml}
-                            </div>
-                        </div>
-                    `;
-                    // Attach delete event listener
-                    const deleteIcon = taskCell.querySelector('.fa-trash');
-                    if (deleteIcon) deleteIcon.addEventListener('click', () => window.deleteTask(task.id));
-                } else {
-                    taskCell.innerHTML = '<span style="color:#444; font-style:italic; font-size:11px;">No tasks</span>';
-                }
-                tr.appendChild(taskCell);
-
-                // Day Cells (4 days instead of 7)
-                for (let i = 0; i < 4; i++) {
-                    const dayCell = document.createElement('td');
-                    dayCell.className = 'note-cell';
-
-                    if (task) {
-                        const date = addDays(state.currentWeekStart, i);
-                        const dateStr = formatDate(date);
-                        const note = state.notes.find(n => n.task_id === task.id && n.date === dateStr);
-                        dayCell.innerHTML = `<textarea class="note-textarea" data-task-id="${task.id}" data-date="${dateStr}" onblur="saveNote(this)">${note ? note.content : ''}</textarea>`;
-                    }
-                    tr.appendChild(dayCell);
-                }
+    function buildSection(categoryId) {
+        const section = sections.get(categoryId);
+        if (!section || section.built) return;
+        section.built = true;
+        if (section.placeholder) section.placeholder.remove();
+        section.placeholder = null;
+        renderSection(categoryId);
+    }
 
-                matrixBody.appendChild(tr);
-            });
+    function visibleTasks(cat) {
+        // Split tasks into not-done and done, then sort done by last checked time
+        const allTasks = tasksOf(cat.id);
+        const undoneTasks = allTasks.filter(t => !t.done);
+        const doneWithTime = allTasks.filter(t => t.done).map(t => {
+            // Checked in this session first, then by the server's done date
+            const ts = state.doneTimestamps[t.id] || (t.done_on ? Date.parse(t.done_on) : 0);
+            return [t, ts];
+        });
+
+        // Most recently checked first; tasks without timestamp fall to the bottom
+        doneWithTime.sort((a, b) => b[1] - a[1]);
+
+        const showAllDone = !!state.expandedDone[cat.id];
+        const visibleDone = showAllDone ? doneWithTime : doneWithTime.slice(0, 3);
+        return { tasks: [...undoneTasks, ...visibleDone.map(([t]) => t)], hasExtraDone: doneWithTime.length > 3 };
+    }
+
+    function renderSection(categoryId, days = visibleDays()) {
+        const section = sections.get(categoryId);
+        const cat = state.categories.find(c => c.id === categoryId);
+        if (!section || !cat) return;
+        const { tasks, hasExtraDone } = visibleTasks(cat);
+
+        if (!section.built) {
+            if (!section.placeholder) {
+                const cell = document.createElement('td');
+                cell.colSpan = 3 + DAY_COLUMNS;
+                section.placeholder = document.createElement('tr');
+                section.placeholder.className = 'section-placeholder';
+                section.placeholder.appendChild(cell);
+                section.tbody.appendChild(section.placeholder);
+            }
+            section.placeholder.firstElementChild.style.height = `${Math.max(tasks.length, 1) * ROW_HEIGHT}px`;
+            return;
+        }
+
+        // Category cell: rebuilt only when the category or its buttons change
+        const catKey = [cat.name, cat.color, hasExtraDone, !!state.expandedDone[cat.id]].join('\u0000');
+        if (section.catKey !== catKey) {
+            const catCell = createCategoryCell(cat, hasExtraDone);
+            if (section.catCell) section.catCell.replaceWith(catCell);
+            section.catCell = catCell;
+            section.catKey = catKey;
+        }
+        section.catCell.rowSpan = Math.max(tasks.length, 1);
+
+        const wanted = tasks.length > 0 ? tasks.map(t => t.id) : [null];  // null: the "No tasks" row
+        const keep = new Set(wanted);
+        section.rows.forEach((tr, id) => {
+            if (keep.has(id)) return;
+            tr.remove();
+            section.rows.delete(id);
+        });
+
+        const rowClass = section.index % 2 === 0 ? 'row-even' : 'row-odd';
+        let previous = null;
+        wanted.forEach(id => {
+            let tr = section.rows.get(id);
+            if (!tr) {
+                tr = id === null ? createEmptyRow() : createTaskRow(id);
+                section.rows.set(id, tr);
+            }
+            if (id !== null) patchTaskRow(tr, state.tasks.get(id), days);
+            if (tr.className !== rowClass) tr.className = rowClass;
+            const expected = previous ? previous.nextElementSibling : section.tbody.firstElementChild;
+            if (tr !== expected) section.tbody.insertBefore(tr, expected);
+            previous = tr;
+        });
+
+        // The category cell spans the section from its first row
+        const first = section.tbody.firstElementChild;
+        if (section.catCell.parentNode !== first) first.insertBefore(section.catCell, first.firstChild);
+    }
+
+    // Redraw one task's row, if its section is built
+    function refreshTask(taskId, days = visibleDays()) {
+        const task = state.tasks.get(taskId);
+        const section = task && sections.get(task.category_id);
+        const tr = section && section.rows.get(taskId);
+        if (tr) patchTaskRow(tr, task, days);
+    }
+
+    function createCategoryCell(cat, hasExtraDone) {
+        const catCell = document.createElement('td');
+        catCell.className = 'category-cell';
+        const showAllDone = !!state.expandedDone[cat.id];
+
+        catCell.innerHTML = `
+            <div class="category-label" style="background-color: ${cat.color}; border-color: ${cat.color}" onclick="editCategory(${cat.id})">
+                <span style="flex:1">${escapeHtml(cat.name)}</span>
+                <span class="cat-controls" style="display:flex; gap:5px; align-items:center;">
+                    <i class="fas fa-chevron-up" style="cursor:pointer; opacity:0.7; font-size:0.8em;" onclick="event.stopPropagation(); moveCategory(${cat.id}, 'up')"></i>
+                    <i class="fas fa-chevron-down" style="cursor:pointer; opacity:0.7; font-size:0.8em;" onclick="event.stopPropagation(); moveCategory(${cat.id}, 'down')"></i>
+                    <i class="fas fa-pen" style="font-size: 0.8em; opacity: 0.5;"></i>
+                </span>
+            </div>
+            <button class="add-task-btn" data-category-id="${cat.id}">+ ADD</button>
+            ${hasExtraDone ? `<button class="toggle-done-btn" data-category-id="${cat.id}" style="margin-top:6px; font-size:10px; padding:3px 6px; background:transparent; border:1px solid var(--border-color); color:var(--text-muted); cursor:pointer;">${showAllDone ? '▲ LESS DONE' : '▼ MORE DONE'}</button>` : ''}
+        `;
+        catCell.querySelector('.add-task-btn').addEventListener('click', () => window.addTask(cat.id));
+        const toggleDoneBtn = catCell.querySelector('.toggle-done-btn');
+        if (toggleDoneBtn) toggleDoneBtn.addEventListener('click', (e) => {
+            e.stopPropagation();
+            toggleDoneVisibility(cat.id);
         });
+        return catCell;
     }
 
-    function renderPersonSelect(task) {
-        if (!task) return '';
+    function createEmptyRow() {
+        const tr = document.createElement('tr');
+        tr.innerHTML = '<td></td><td><span style="color:#444; font-style:italic; font-size:11px;">No tasks</span></td>'
+            + '<td class="note-cell"></td>'.repeat(DAY_COLUMNS);
+        return tr;
+    }
+
+    // The row's controls are created once; patchTaskRow() fills them in.
+    // Handlers look the task up by id, so they stay valid across updates.
+    function createTaskRow(taskId) {
+        const tr = document.createElement('tr');
+        tr.dataset.taskId = taskId;
+
+        const whoCell = document.createElement('td');
+        const select = document.createElement('select');
+        select.className = 'who-select';
+        select.addEventListener('change', () => window.updateTaskPerson(taskId, select.value));
+        whoCell.appendChild(select);
+
+        const taskCell = document.createElement('td');
+        taskCell.innerHTML = `
+            <div class="task-input-container">
+                <div class="task-main-row">
+                    <input type="checkbox" class="task-checkbox">
+                    <textarea class="task-text-input" rows="1"></textarea>
+                    <i class="fas fa-trash" data-task-id="${taskId}" style="cursor:pointer; color:#444; font-size:10px;"></i>
+                </div>
+                <div class="task-notes-container"></div>
+            </div>
+        `;
+        const checkbox = taskCell.querySelector('.task-checkbox');
+        checkbox.addEventListener('change', () => window.toggleTask(taskId, checkbox.checked));
+        const text = taskCell.querySelector('.task-text-input');
+        text.addEventListener('blur', () => window.updateTaskText(taskId, text.value));
+        taskCell.querySelector('.fa-trash').addEventListener('click', () => window.deleteTask(taskId));
+        tr.append(whoCell, taskCell);
+
+        // Day Cells (4 days instead of 7)
+        const days = [];
+        for (let i = 0; i < DAY_COLUMNS; i++) {
+            const dayCell = document.createElement('td');
+            dayCell.className = 'note-cell';
+            const textarea = document.createElement('textarea');
+            textarea.className = 'note-textarea';
+            textarea.dataset.taskId = taskId;
+            textarea.addEventListener('blur', () => window.saveNote(textarea));
+            dayCell.appendChild(textarea);
+            tr.appendChild(dayCell);
+            days.push(textarea);
+        }
+
+        tr._refs = { select, checkbox, text, notes: taskCell.querySelector('.task-notes-container'), days };
+        tr._view = {};  // what is currently drawn, to skip unchanged writes
+        return tr;
+    }
+
+    function patchTaskRow(tr, task, days) {
+        const refs = tr._refs;
+        const view = tr._view;
+
+        // state.people is replaced whenever a person changes
+        if (view.people !== state.people || view.personId !== task.person_id) {
+            refs.select.innerHTML = personOptions(task.person_id);
+            view.people = state.people;
+            view.personId = task.person_id;
+        }
+        if (refs.checkbox.checked !== !!task.done) refs.checkbox.checked = !!task.done;
+        if (refs.text.classList.contains('done') !== !!task.done) refs.text.classList.toggle('done', !!task.done);
+        // Never overwrite what the user is typing
+        if (refs.text.value !== task.text && document.activeElement !== refs.text) refs.text.value = task.text;
+
+        // Note previews: the loaded notes of this task (visible and adjacent weeks)
+        const notes = [...(state.notes.get(task.id) || new Map()).values()]
+            .filter(n => n.content && n.content.trim() !== '')
+            .sort((a, b) => a.date.localeCompare(b.date));
+        const notesKey = notes.map(n => `${n.date}\u0000${n.content}`).join('\u0001');
+        if (view.notesKey !== notesKey) {
+            renderNotePreviews(refs.notes, task.id, notes);
+            view.notesKey = notesKey;
+        }
+
+        refs.days.forEach((textarea, i) => {
+            const dateStr = days[i];
+            if (textarea.dataset.date !== dateStr) textarea.dataset.date = dateStr;
+            const note = getNote(task.id, dateStr);
+            const content = note ? note.content || '' : '';
+            if (textarea.value !== content && document.activeElement !== textarea) textarea.value = content;
+        });
+    }
+
+    function renderNotePreviews(container, taskId, notes) {
+        container.replaceChildren(...notes.map(note => {
+            // note.date is in YYYY-MM-DD format
+            const [year, month, day] = note.date.split('-').map(Number);
+            const jsDate = new Date(year, month - 1, day);
+            const preview = document.createElement('div');
+            preview.className = 'task-note-preview';
+            const date = document.createElement('span');
+            date.className = 'note-date';
+            date.textContent = `(${DAYS_SHORT[jsDate.getDay()]} ${jsDate.getDate()})`;
+            const remove = document.createElement('span');
+            remove.className = 'note-delete';
+            remove.style.cssText = 'margin-left:6px; cursor:pointer; color:#666;';
+            remove.textContent = '×';
+            remove.addEventListener('click', () => window.deleteNote(taskId, note.date));
+            preview.append(date, ` ${note.content} `, remove);
+            return preview;
+        }));
+    }
+
+    function personOptions(selectedId) {
         let options = '<option value="">--</option>';
         state.people.forEach(p => {
-            const selected = task.person_id === p.id ? 'selected' : '';
-            options += `<option value="${p.id}" ${selected}>${p.name}</option>`;
+            const selected = selectedId === p.id ? 'selected' : '';
+            options += `<option value="${p.id}" ${selected}>${escapeHtml(p.name)}</option>`;
         });
-        return `<select class="who-select" onchange="updateTaskPerson(${task.id}, this.value)">${options}</select>`;
+        return options;
+    }
+
+    function escapeHtml(text) {
+        return String(text).replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' })[c]);
     }
 
     function updateHeaderDates() {
@@ -190,12 +616,11 @@ document.addEventListener('DOMContentLoaded', () => {
         const end = addDays(start, 3);
         const monthNames = ["JANUARY", "FEBRUARY", "MARCH", "APRIL", "MAY", "JUNE", "JULY", "AUGUST", "SEPTEMBER", "OCTOBER", "NOVEMBER", "DECEMBER"];
         monthYearDisplay.textContent = `${monthNames[start.getMonth()]} ${start.getFullYear()}`;
-        const daysShort = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'];
-        weekRangeDisplay.textContent = `${daysShort[start.getDay()]} ${start.getDate()} - ${daysShort[end.getDay()]} ${end.getDate()}`;
+        weekRangeDisplay.textContent = `${DAYS_SHORT[start.getDay()]} ${start.getDate()} - ${DAYS_SHORT[end.getDay()]} ${end.getDate()}`;
 
         dayHeaders.forEach((th, index) => {
             const date = addDays(start, index);
-            th.textContent = `${daysShort[date.getDay()].toUpperCase()} ${date.getDate()}`;
+            th.textContent = `${DAYS_SHORT[date.getDay()].toUpperCase()} ${date.getDate()}`;
             const today = new Date();
             if (date.toDateString() === today.toDateString()) {
                 th.classList.add('is-today');
@@ -206,6 +631,18 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- Actions ---
+    // Edits are optimistic: the store and the affected row change first,
+    // then the request goes out, and a failed request puts the old values back.
+    async function send(url, method, body) {
+        const response = await fetch(url, {
+            method,
+            headers: { 'Content-Type': 'application/json' },
+            body: body === undefined ? undefined : JSON.stringify(body)
+        });
+        if (!response.ok) throw new Error(`${method} ${url} failed: ${response.status}`);
+        return response;
+    }
+
     window.addTask = async (categoryId) => {
         const text = prompt("New Task Description:");
         if (!text) return;
@@ -215,7 +652,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ category_id: categoryId, text: text })
             });
-            fetchInitData();
+            syncChanges();
         } catch (error) {
             console.error(error);
             alert("Error adding task");
@@ -229,28 +666,17 @@ document.addEventListener('DOMContentLoaded', () => {
         const targetIndex = direction === 'up' ? index - 1 : index + 1;
         if (targetIndex < 0 || targetIndex >= state.categories.length) return;
 
-        const currentCat = state.categories[index];
+        // Only the moved category is rewritten (fractional order between neighbours)
         const targetCat = state.categories[targetIndex];
-
-        // Swap orders
-        const tempOrder = currentCat.order;
-        currentCat.order = targetCat.order;
-        targetCat.order = tempOrder;
+        const placement = direction === 'up' ? { before_id: targetCat.id } : { after_id: targetCat.id };
 
         try {
-            await Promise.all([
-                fetch(`/api/categories/${currentCat.id}`, {
-                    method: 'PUT',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ order: currentCat.order })
-                }),
-                fetch(`/api/categories/${targetCat.id}`, {
-                    method: 'PUT',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ order: targetCat.order })
-                })
-            ]);
-            fetchInitData();
+            await fetch(`/api/categories/${id}/move`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(placement)
+            });
+            syncChanges();
         } catch (error) {
             console.error(error);
             alert("Error moving category");
@@ -268,7 +694,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ name: newName })
                 });
-                fetchInitData();
+                syncChanges();
             } catch (error) {
                 console.error(error);
                 alert("Error updating category");
@@ -277,23 +703,28 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     window.toggleTask = async (id, done) => {
-        await updateTask(id, { done });
-
         // Track when the task was marked as done (for ordering completed tasks)
+        const previousTimestamp = state.doneTimestamps[id];
         if (done) {
             state.doneTimestamps[id] = Date.now();
         } else {
             delete state.doneTimestamps[id];
         }
 
-        // Recharger les données depuis l'API pour refléter l'état "done" côté backend
-        // (et donc reconstruire correctement la ligne avec la case cochée/décochée)
-        fetchInitData();
+        if (await updateTask(id, { done })) {
+            // Pick up what the server derived from it (done_on)
+            syncChanges();
+            return;
+        }
+        if (previousTimestamp === undefined) delete state.doneTimestamps[id];
+        else state.doneTimestamps[id] = previousTimestamp;
+        const task = state.tasks.get(id);
+        if (task) renderSection(task.category_id);
     };
 
     function toggleDoneVisibility(categoryId) {
         state.expandedDone[categoryId] = !state.expandedDone[categoryId];
-        renderMatrix();
+        renderSection(categoryId);
     }
 
     window.updateTaskText = async (id, text) => {
@@ -301,69 +732,79 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     window.updateTaskPerson = async (id, personId) => {
-        await updateTask(id, { person_id: personId || null });
+        await updateTask(id, { person_id: personId ? Number(personId) : null });
     };
 
+    // Returns false when the server refused the change (it is rolled back)
     async function updateTask(id, payload) {
+        const task = state.tasks.get(id);
+        if (!task) return false;
+        if (Object.keys(payload).every(k => task[k] === payload[k])) return true;  // nothing changed
+        const previous = Object.fromEntries(Object.keys(payload).map(k => [k, task[k]]));
+        Object.assign(task, payload);
+        renderSection(task.category_id);
         try {
-            await fetch(`/api/tasks/${id}`, {
-                method: 'PUT',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(payload)
-            });
+            await send(`/api/tasks/${id}`, 'PUT', payload);
+            return true;
         } catch (error) {
             console.error(error);
+            Object.assign(task, previous);
+            renderSection(task.category_id);
+            return false;
         }
     }
 
     window.deleteTask = async (id) => {
         if (!confirm("Delete task?")) return;
+        const notes = state.notes.get(id);
+        const task = removeTask(id);
+        if (!task) return;
+        renderSection(task.category_id);
         try {
-            await fetch(`/api/tasks/${id}`, { method: 'DELETE' });
-            fetchInitData();
+            await send(`/api/tasks/${id}`, 'DELETE');
+            syncChanges();
         } catch (error) {
             console.error(error);
+            putTask(task);
+            if (notes) state.notes.set(id, notes);
+            renderSection(task.category_id);
             alert("Error deleting task");
         }
     };
 
     window.saveNote = async (textarea) => {
-        const taskId = textarea.dataset.taskId;
+        const taskId = Number(textarea.dataset.taskId);
         const date = textarea.dataset.date;
         const content = textarea.value;
+        const existing = getNote(taskId, date);
+        const previous = existing ? existing.content || '' : null;
+        if ((previous || '') === content) return;  // unchanged: no request
+
+        putNote({ task_id: taskId, date, content });
+        refreshTask(taskId);
         try {
-            await fetch('/api/notes', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ task_id: taskId, date, content })
-            });
-            const existing = state.notes.find(n => n.task_id == taskId && n.date == date);
-            if (existing) existing.content = content;
-            else state.notes.push({ task_id: taskId, date, content });
+            await send('/api/notes', 'POST', { task_id: taskId, date, content });
         } catch (error) {
             console.error(error);
+            if (previous === null) state.notes.get(taskId).delete(date);
+            else putNote({ task_id: taskId, date, content: previous });
+            refreshTask(taskId);
         }
     };
 
     window.deleteNote = async (taskId, date) => {
         if (!confirm("Delete note for this day?")) return;
+        const notes = state.notes.get(taskId);
+        const previous = notes && notes.get(date);
+        if (notes) notes.delete(date);
+        refreshTask(taskId);
         try {
             // Clear note content for this task/date (backend treats it as upsert)
-            await fetch('/api/notes', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ task_id: taskId, date, content: '' })
-            });
-
-            // Update local cache: either remove the note or clear its content
-            const existingIndex = state.notes.findIndex(n => n.task_id == taskId && n.date == date);
-            if (existingIndex !== -1) {
-                state.notes.splice(existingIndex, 1);
-            }
-
-            renderMatrix();
+            await send('/api/notes', 'POST', { task_id: taskId, date, content: '' });
         } catch (error) {
             console.error(error);
+            if (previous) putNote(previous);
+            refreshTask(taskId);
         }
     };
 
@@ -389,18 +830,15 @@ document.addEventListener('DOMContentLoaded', () => {
 
     function setupEventListeners() {
         document.getElementById('prev-week').addEventListener('click', () => {
-            state.currentWeekStart = addDays(state.currentWeekStart, -1);
-            renderMatrix();
+            showWeek(addDays(state.currentWeekStart, -1));
         });
 
         document.getElementById('next-week').addEventListener('click', () => {
-            state.currentWeekStart = addDays(state.currentWeekStart, 1);
-            renderMatrix();
+            showWeek(addDays(state.currentWeekStart, 1));
         });
 
         document.getElementById('today-btn').addEventListener('click', () => {
-            state.currentWeekStart = new Date();
-            renderMatrix();
+            showWeek(new Date());
         });
 
         const catModal = document.getElementById('category-modal');
@@ -425,9 +863,10 @@ document.addEventListener('DOMContentLoaded', () => {
 
         document.getElementById('save-btn').addEventListener('click', async () => {
             try {
-                const response = await fetch('/api/backup');
-                const data = await response.json();
-                const blob = new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' });
+                // Streamed from the server, saved as-is (no parse/re-serialize)
+                const response = await fetch('/api/backup?stream=json');
+                if (!response.ok) throw new Error(`Backup failed: ${response.status}`);
+                const blob = await response.blob();
                 const url = URL.createObjectURL(blob);
                 const a = document.createElement('a');
                 a.href = url;
@@ -449,34 +888,55 @@ document.addEventListener('DOMContentLoaded', () => {
         document.getElementById('restore-file-input').addEventListener('change', async (e) => {
             const file = e.target.files[0];
             if (!file) return;
-            const reader = new FileReader();
-            reader.onload = async (event) => {
-                try {
-                    const data = JSON.parse(event.target.result);
-                    const res = await fetch('/api/restore', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify(data)
-                    });
-                    if (res.ok) {
-                        alert('Restore successful!');
-                        location.reload();
-                    } else {
-                        alert('Restore failed.');
-                    }
-                } catch (error) {
-                    console.error(error);
-                    alert('Invalid backup file.');
+            // Upload the file as-is: the server parses it incrementally
+            const name = file.name.toLowerCase();
+            const compressed = name.endsWith('.gz');
+            const format = name.replace(/\.gz$/, '').endsWith('.ndjson') ? 'ndjson' : 'json';
+            const contentType = compressed ? 'application/gzip'
+                : (format === 'ndjson' ? 'application/x-ndjson' : 'application/json');
+            try {
+                const res = await fetch(`/api/restore?format=${format}`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': contentType },
+                    body: file
+                });
+                if (res.ok) {
+                    alert('Restore successful!');
+                    location.reload();
+                } else {
+                    const data = await res.json().catch(() => ({}));
+                    alert(`Restore failed.${data.error ? '\n' + data.error : ''}`);
                 }
-            };
-            reader.readAsText(file);
+            } catch (error) {
+                console.error(error);
+                alert('Invalid backup file.');
+            }
         });
 
-        document.getElementById('pdf-btn').addEventListener('click', () => {
-            // Open PDF in new tab (fullscreen)
+        document.getElementById('pdf-btn').addEventListener('click', async () => {
+            // Open the tab right away (popup blockers), render in the background,
+            // then point the tab at the finished PDF (fullscreen)
             const week_start = formatDate(state.currentWeekStart);
-            const pdfUrl = `/api/export-pdf?week_start=${week_start}`;
-            window.open(pdfUrl, '_blank');
+            const pdfWindow = window.open('', '_blank');
+            try {
+                const res = await fetch('/api/export-pdf/jobs', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ week_start })
+                });
+                let job = await res.json();
+                if (!res.ok) throw new Error(job.error);
+                while (job.status === 'queued' || job.status === 'running') {
+                    await new Promise(resolve => setTimeout(resolve, 300));
+                    job = await (await fetch(job.status_url)).json();
+                }
+                if (job.status !== 'done') throw new Error(job.error || job.status);
+                pdfWindow.location = job.result_url;
+            } catch (error) {
+                console.error(error);
+                if (pdfWindow) pdfWindow.close();
+                alert("Error exporting PDF");
+            }
         });
 
         document.getElementById('category-form').addEventListener('submit', async (e) => {
@@ -489,7 +949,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ name, color })
                 });
-                fetchInitData();
+                syncChanges();
                 catModal.style.display = 'none';
                 document.getElementById('category-form').reset();
             } catch (error) {
@@ -533,7 +993,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ name })
                 });
-                fetchInitData();
+                syncChanges();
                 teamModal.style.display = 'none';
                 document.getElementById('team-form').reset();
             } catch (error) {
@@ -558,7 +1018,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!confirm("Delete category?")) return;
         try {
             await fetch(`/api/categories/${id}`, { method: 'DELETE' });
-            fetchInitData();
+            syncChanges();
             document.getElementById('category-modal').style.display = 'none';
         } catch (error) {
             console.error(error);
@@ -570,7 +1030,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!confirm("Delete person?")) return;
         try {
             await fetch(`/api/people/${id}`, { method: 'DELETE' });
-            await fetchInitData();
+            await syncChanges();
             // Re-render the team list to update the modal
             renderManageList('team-list', state.people, deletePerson);
         } catch (error) {
@@ -578,4 +1038,7 @@ document.addEventListener('DOMContentLoaded', () => {
             alert("Error deleting person");
         }
     };
+
+    // Init (last: the handler's const declarations above must exist first)
+    init();
 });
@@ -0,0 +1,1062 @@
+"""
+In-process API tests for SEB OPS SYSTEM v5.
+
+Unlike test_suite.py these run against the Flask test client and a throwaway
+SQLite file, so no server needs to be running:
+
+    python -m pytest -q test_api.py
+"""
+
+import gzip
+import io
+import json
+import atexit
+import contextlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from datetime import date, datetime, timedelta
+
+# Shared by every test module in the process: app binds its engine on import
+_DB_PATH = os.path.join(tempfile.gettempdir(), f'seb_ops_test_{os.getpid()}.db')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + _DB_PATH)
+
+
+@atexit.register
+def _remove_test_db():
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(_DB_PATH)
+
+
+from sqlalchemy import event, text
+
+from app import app, pdf_cache, profile_store, collect_pdf_sections, collect_pdf_batch
+from archive import archive_cutoff, archive_done_tasks
+from backup import iter_json_backup
+from metrics import metrics
+from migrations import migrate_db
+from pdf_cache import PdfCache
+from pdf_jobs import PdfJobQueue
+from profiler import ProfilerMiddleware
+from search import search_available, _fts5_builds
+from ordering import MIN_ORDER_GAP, schedule_rebalance
+from models import db, Category, Person, Task, Note
+
+
+class QueryCounter:
+    """Counts SQL statements sent to the engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+class ApiTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            migrate_db()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def seed_board(self, n_categories, tasks_per_category=3, n_people=3):
+        with app.app_context():
+            people = [Person(name=f"Person {i}") for i in range(n_people)]
+            db.session.add_all(people)
+            db.session.flush()
+            for c in range(n_categories):
+                cat = Category(name=f"Cat {c}", color="#ff0000", order=c + 1)
+                db.session.add(cat)
+                db.session.flush()
+                for t in range(tasks_per_category):
+                    db.session.add(Task(
+                        category_id=cat.id,
+                        person_id=people[t % n_people].id,
+                        text=f"Task {c}.{t}",
+                        order=t + 1
+                    ))
+            db.session.commit()
+
+
+class TestInit(ApiTestCase):
+    def count_init_queries(self):
+        with app.app_context():
+            with QueryCounter(db.engine) as counter:
+                response = self.client.get('/api/init')
+        self.assertEqual(response.status_code, 200)
+        return counter.count, response.get_json()
+
+    def test_01_init_structure(self):
+        self.seed_board(2, tasks_per_category=3)
+        _, data = self.count_init_queries()
+        self.assertEqual([c['name'] for c in data['categories']], ["Cat 0", "Cat 1"])
+        self.assertEqual([t['text'] for t in data['categories'][0]['tasks']],
+                         ["Task 0.0", "Task 0.1", "Task 0.2"])
+        self.assertEqual(len(data['people']), 3)
+
+    def test_02_init_query_count_is_constant(self):
+        self.seed_board(2)
+        small_count, _ = self.count_init_queries()
+
+        self.seed_board(50)
+        large_count, data = self.count_init_queries()
+
+        self.assertEqual(len(data['categories']), 52)
+        self.assertEqual(small_count, large_count)
+
+
+class TestBootstrap(ApiTestCase):
+    def bootstrap(self):
+        response = self.client.get('/tasks')
+        self.assertEqual(response.status_code, 200)
+        match = re.search(r'<script id="board-bootstrap" type="application/json">(.*?)</script>',
+                          response.get_data(as_text=True), re.S)
+        return response, match and json.loads(match.group(1))
+
+    def test_01_page_embeds_board_and_current_notes(self):
+        self.seed_board(2)
+        today = date.today()
+        monday = today - timedelta(days=today.weekday())
+        for task_id, day, content in ((1, today, '</script><b>today</b>'), (2, monday - timedelta(days=1), 'old')):
+            self.client.post('/api/notes', json={"task_id": task_id, "date": day.isoformat(), "content": content})
+
+        response, data = self.bootstrap()
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        init = self.client.get('/api/init').get_json()
+        self.assertEqual({k: data[k] for k in init}, init)
+        self.assertIn(monday.isoformat(), data['note_weeks'])
+        self.assertEqual([n['content'] for n in data['notes']], ['</script><b>today</b>'])
+
+    def test_02_large_weeks_and_disabled_flag_fall_back_to_api(self):
+        self.seed_board(1)
+        self.client.post('/api/notes', json={"task_id": 1, "date": date.today().isoformat(), "content": "x"})
+        app.config['NOTES_PAGE_SIZE'], page_size = 0, app.config['NOTES_PAGE_SIZE']
+        self.addCleanup(app.config.__setitem__, 'NOTES_PAGE_SIZE', page_size)
+        _, data = self.bootstrap()
+        self.assertEqual((data['note_weeks'], data['notes']), ([], []))
+
+        app.config['BOARD_BOOTSTRAP'] = False
+        self.addCleanup(app.config.__setitem__, 'BOARD_BOOTSTRAP', True)
+        self.assertIsNone(self.bootstrap()[1])
+
+
+class TestNotes(ApiTestCase):
+    def test_01_upsert_updates_in_place(self):
+        self.seed_board(1, tasks_per_category=1)
+        payload = {"task_id": 1, "date": "2025-01-01", "content": "first"}
+        first = self.client.post('/api/notes', json=payload).get_json()
+        payload['content'] = "second"
+        second = self.client.post('/api/notes', json=payload).get_json()
+
+        self.assertEqual(first['id'], second['id'])
+        self.assertEqual(second['content'], "second")
+        with app.app_context():
+            self.assertEqual(Note.query.count(), 1)
+
+    def test_02_migration_merges_duplicates(self):
+        self.seed_board(1, tasks_per_category=1)
+        with app.app_context():
+            # Simulate a database created before the unique index existed
+            db.session.execute(text("DROP INDEX ix_note_task_date"))
+            for content in ("live", "stale"):
+                db.session.execute(text(
+                    "INSERT INTO note (task_id, date, content) VALUES (1, '2025-01-01', :c)"
+                ), {'c': content})
+            db.session.commit()
+
+            migrate_db()
+            notes = Note.query.all()
+            self.assertEqual([n.content for n in notes], ["live"])
+
+        response = self.client.post('/api/notes', json={"task_id": 1, "date": "2025-01-01", "content": "new"})
+        self.assertEqual(response.get_json()['id'], notes[0].id)
+
+        for body in ({"task_id": "abc", "date": "2025-01-01", "content": "x"},
+                     {"task_id": None, "date": "2025-01-01", "content": "x"}, {"task_id": 1}):
+            self.assertEqual(self.client.post('/api/notes', json=body).status_code, 400, body)
+
+    def test_03_notes_range_paging_uses_date_index(self):
+        self.seed_board(1, tasks_per_category=3)
+        for day in range(1, 11):
+            for task_id in (1, 2, 3):
+                self.client.post('/api/notes', json={"task_id": task_id, "date": f"2025-01-{day:02d}", "content": "x"})
+
+        app.config['NOTES_PAGE_SIZE'] = 4
+        try:
+            url = '/api/notes?start_date=2025-01-03&end_date=2025-01-05'
+            seen = []
+            while url:
+                response = self.client.get(url)
+                seen += response.get_json()
+                after = response.headers.get('X-Next-After')
+                url = f'/api/notes?start_date=2025-01-03&end_date=2025-01-05&after={after}' if after else None
+        finally:
+            app.config['NOTES_PAGE_SIZE'] = 2000
+
+        self.assertEqual(len(seen), 9)
+        self.assertEqual(len({n['id'] for n in seen}), 9)
+        self.assertTrue(all('2025-01-03' <= n['date'] <= '2025-01-05' for n in seen))
+
+        with app.app_context():
+            plan = db.session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM note WHERE date >= '2025-01-03' "
+                "AND date <= '2025-01-05' ORDER BY date, id"
+            )).all()
+        self.assertIn('ix_note_date', ' '.join(str(row[-1]) for row in plan))
+
+    def test_04_notes_paging_clamps_limit_and_rejects_bad_cursor(self):
+        self.seed_board(1, tasks_per_category=3)
+        for task_id in (1, 2, 3):
+            self.client.post('/api/notes', json={"task_id": task_id, "date": "2025-01-03", "content": "x"})
+        url = '/api/notes?start_date=2025-01-01&end_date=2025-01-31'
+
+        app.config['NOTES_PAGE_SIZE'] = 2
+        try:
+            self.assertEqual(len(self.client.get(url + '&limit=50').get_json()), 2)
+            for limit in (0, -1):
+                response = self.client.get(f'{url}&limit={limit}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.get_json()), 1)
+                self.assertIn('X-Next-After', response.headers)
+        finally:
+            app.config['NOTES_PAGE_SIZE'] = 2000
+
+        for after in ('bogus', '2025-01-03:x', 'nope:1'):
+            self.assertEqual(self.client.get(f'{url}&after={after}').status_code, 400, after)
+
+
+class TestChanges(ApiTestCase):
+    def changes(self, since):
+        response = self.client.get(f'/api/changes?since={since}')
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_01_changes_since_init(self):
+        self.seed_board(2, tasks_per_category=2)
+        rev = self.client.get('/api/init').get_json()['rev']
+
+        self.client.put('/api/tasks/1', json={"done": True})
+        self.client.post('/api/notes', json={"task_id": 2, "date": "2025-01-01", "content": "hi"})
+        data = self.changes(rev)
+
+        self.assertFalse(data['reset'])
+        self.assertEqual([t['id'] for t in data['tasks']], [1])
+        self.assertTrue(data['tasks'][0]['done'])
+        self.assertEqual([n['content'] for n in data['notes']], ["hi"])
+        self.assertEqual(data['categories'], [])
+        self.assertEqual(self.changes(data['rev'])['tasks'], [])
+
+    def test_02_deletes_leave_tombstones(self):
+        self.seed_board(2, tasks_per_category=2)
+        self.client.post('/api/notes', json={"task_id": 1, "date": "2025-01-01", "content": "hi"})
+        rev = self.client.get('/api/init').get_json()['rev']
+
+        self.client.delete('/api/categories/1')
+        self.client.delete('/api/people/1')
+        data = self.changes(rev)
+
+        self.assertEqual(data['deleted']['category'], [1])
+        self.assertEqual(sorted(data['deleted']['task']), [1, 2])
+        self.assertEqual(len(data['deleted']['note']), 1)
+        self.assertEqual(data['deleted']['person'], [1])
+        # Task 3 (category 2) was assigned to the deleted person
+        self.assertEqual([(t['id'], t['person_id']) for t in data['tasks']], [(3, None)])
+
+    def test_03_restore_forces_reset(self):
+        self.seed_board(1)
+        rev = self.client.get('/api/init').get_json()['rev']
+        backup = self.client.get('/api/backup').get_json()
+        self.client.post('/api/restore', json=backup)
+        self.assertTrue(self.changes(rev)['reset'])
+        self.assertEqual(self.client.get('/api/changes').status_code, 400)
+
+
+class TestEventStream(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['EVENT_STREAM_ENABLED'] = True
+        self.addCleanup(app.config.__setitem__, 'EVENT_STREAM_ENABLED', False)
+
+    def open_stream(self, since):
+        response = self.client.get(f'/api/stream?since={since}', buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.addCleanup(response.close)
+        chunks = iter(response.response)
+        self.assertTrue(next(chunks).startswith(b'retry:'))
+        return chunks
+
+    def parse_event(self, chunk):
+        fields = dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+        self.assertEqual(fields['event'], 'changes')
+        return int(fields['id']), json.loads(fields['data'])
+
+    def test_01_backlog_is_sent_on_connect(self):
+        self.seed_board(1)
+        rev = self.client.get('/api/init').get_json()['rev']
+        self.client.put('/api/tasks/1', json={"done": True})
+        event_id, data = self.parse_event(next(self.open_stream(rev)))
+        self.assertEqual(event_id, data['rev'])
+        self.assertEqual([t['id'] for t in data['tasks']], [1])
+
+    def test_02_commits_wake_the_stream(self):
+        self.seed_board(1)
+        rev = self.client.get('/api/init').get_json()['rev']
+        chunks = self.open_stream(rev)
+        writer = threading.Timer(0.2, lambda: app.test_client().post(
+            '/api/notes', json={"task_id": 1, "date": "2025-01-01", "content": "live"}))
+        writer.start()
+        started = time.perf_counter()
+        _, data = self.parse_event(next(chunks))
+        writer.join()
+        self.assertLess(time.perf_counter() - started, app.config['EVENT_STREAM_KEEPALIVE'])
+        self.assertEqual([n['content'] for n in data['notes']], ["live"])
+
+    def test_03_idle_stream_sends_keepalives(self):
+        app.config['EVENT_STREAM_KEEPALIVE'] = 0.05
+        self.addCleanup(app.config.__setitem__, 'EVENT_STREAM_KEEPALIVE', 15)
+        chunks = self.open_stream(0)
+        self.assertEqual(next(chunks), b': keepalive\n\n')
+        self.assertEqual(self.client.get('/api/stream').status_code, 400)
+
+    def test_04_streams_end_after_an_event_or_their_lifetime(self):
+        self.seed_board(1)
+        rev = self.client.get('/api/init').get_json()['rev']
+        self.client.put('/api/tasks/1', json={"done": True})
+        chunks = self.open_stream(rev)
+        self.parse_event(next(chunks))
+        self.assertEqual(list(chunks), [])
+
+        app.config['EVENT_STREAM_LIFETIME'] = 0.1
+        self.addCleanup(app.config.__setitem__, 'EVENT_STREAM_LIFETIME', 25)
+        started = time.perf_counter()
+        self.assertEqual(list(self.open_stream(rev + 1)), [])
+        self.assertLess(time.perf_counter() - started, 5)
+
+        app.config['EVENT_STREAM_ENABLED'] = False
+        self.assertEqual(self.client.get(f'/api/stream?since={rev}').status_code, 404)
+        self.assertNotIn(b'data-live-updates', self.client.get('/tasks').data)
+
+
+class TestConditionalGet(ApiTestCase):
+    READ_URLS = ['/api/init', '/api/people', '/api/notes?start_date=2025-01-01',
+                 '/api/backup', '/api/backup?stream=ndjson']
+
+    def test_01_unchanged_board_answers_304_without_queries(self):
+        self.seed_board(2)
+        for url in self.READ_URLS:
+            first = self.client.get(url)
+            etag = first.headers['ETag']
+            self.assertFalse(etag.startswith('W/'), url)
+            with app.app_context():
+                with QueryCounter(db.engine) as counter:
+                    second = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(second.status_code, 304, url)
+            self.assertEqual(second.data, b'', url)
+            self.assertEqual(second.headers['ETag'], etag, url)
+            # Only the revision lookup ran
+            self.assertEqual(counter.count, 1, url)
+
+    def test_02_writes_and_arguments_change_the_etag(self):
+        self.seed_board(1)
+        etag = self.client.get('/api/init').headers['ETag']
+        self.assertNotEqual(etag, self.client.get('/api/people').headers['ETag'])
+        self.assertNotEqual(self.client.get('/api/backup').headers['ETag'],
+                            self.client.get('/api/backup?stream=json').headers['ETag'])
+
+        self.client.post('/api/notes', json={"task_id": 1, "date": "2025-01-01", "content": "hi"})
+        response = self.client.get('/api/init', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_03_errors_carry_no_etag(self):
+        response = self.client.get('/api/backup?stream=xml')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response.headers)
+
+
+class TestCompression(ApiTestCase):
+    GZIP = {'Accept-Encoding': 'gzip'}
+
+    def test_01_large_json_is_gzipped(self):
+        self.seed_board(20)
+        plain = self.client.get('/api/init')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertIn('Accept-Encoding', plain.headers['Vary'])
+
+        response = self.client.get('/api/init', headers=self.GZIP)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertLess(len(response.data), len(plain.data))
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+
+        # The revision ETag survives compression as a weak validator
+        etag = response.headers['ETag']
+        self.assertEqual(etag, 'W/' + plain.headers['ETag'])
+        again = self.client.get('/api/init', headers={**self.GZIP, 'If-None-Match': etag})
+        self.assertEqual(again.status_code, 304)
+
+    def test_02_small_bodies_are_left_alone(self):
+        response = self.client.get('/api/people', headers=self.GZIP)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_03_streamed_backup_is_compressed_incrementally(self):
+        self.seed_board(20)
+        plain = self.client.get('/api/backup?stream=ndjson').data
+        response = self.client.get('/api/backup?stream=ndjson', headers=self.GZIP)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertEqual(gzip.decompress(response.data), plain)
+
+    def test_04_static_files_are_served_precompressed(self):
+        with open(os.path.join(app.static_folder, 'js', 'script.js'), 'rb') as f:
+            source = f.read()
+        response = self.client.get('/static/js/script.js', headers=self.GZIP)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'text/javascript')
+        self.assertEqual(gzip.decompress(response.data), source)
+        response.close()
+        cached = self.client.get('/static/js/script.js',
+                                 headers={**self.GZIP, 'If-None-Match': response.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        plain = self.client.get('/static/js/script.js')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(plain.data, source)
+        plain.close()
+
+
+class TestMetrics(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.clear()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.mimetype, 'text/plain')
+        samples = {}
+        for line in response.get_data(as_text=True).splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_01_requests_are_recorded_per_route(self):
+        self.seed_board(2)
+        for task_id in (1, 2):
+            self.client.put(f'/api/tasks/{task_id}', json={"done": True})
+        init = self.client.get('/api/init')
+        samples = self.scrape()
+
+        put = 'route="/api/tasks/<int:id>",method="PUT"'
+        self.assertEqual(samples[f'http_requests_total{{{put},status="200"}}'], 2)
+        self.assertEqual(samples[f'http_request_duration_seconds_count{{{put}}}'], 2)
+        self.assertEqual(samples[f'http_request_duration_seconds_bucket{{{put},le="+Inf"}}'], 2)
+        get = 'route="/api/init",method="GET"'
+        self.assertEqual(samples[f'http_response_size_bytes_sum{{{get}}}'], len(init.data))
+        # Revision (for the ETag, then for the body) plus three list queries
+        self.assertEqual(samples[f'db_queries_per_request_sum{{{get}}}'], 5)
+        self.assertGreater(samples[f'db_query_duration_seconds_sum{{{get}}}'], 0)
+
+    def test_02_pdf_build_time(self):
+        self.seed_board(1)
+        self.client.get('/api/export-pdf')
+        self.assertEqual(self.scrape()['pdf_build_seconds_count'], 1)
+
+    def test_03_slow_requests_are_logged(self):
+        app.config['METRICS_SLOW_REQUEST_MS'] = 0
+        self.addCleanup(app.config.__setitem__, 'METRICS_SLOW_REQUEST_MS', 500)
+        with self.assertLogs(app.logger, 'WARNING') as logs:
+            self.client.get('/api/people')
+        self.assertIn('Slow request GET /api/people -> 200', logs.output[0])
+        self.assertIn('2 queries', logs.output[0])  # revision + people
+
+
+class TestProfiler(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # Off by default: the WSGI app is not even wrapped
+        self.assertNotIsInstance(app.wsgi_app, ProfilerMiddleware)
+        self.assertEqual(self.client.get('/api/admin/profiles').status_code, 404)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(setattr, profile_store, 'directory', profile_store.directory)
+        self.addCleanup(setattr, profile_store, 'max_profiles', profile_store.max_profiles)
+        self.addCleanup(setattr, app, 'wsgi_app', app.wsgi_app)
+        self.addCleanup(app.config.__setitem__, 'PROFILER_ENABLED', False)
+        profile_store.directory, profile_store.max_profiles = directory, 3
+        app.config['PROFILER_ENABLED'] = True
+        app.wsgi_app = ProfilerMiddleware(app.wsgi_app, profile_store)
+
+    def test_01_only_requested_profiles_are_captured(self):
+        self.seed_board(2)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/init').headers)
+        response = self.client.get('/api/init', headers={'X-Profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()['categories']), 2)
+        profile_id = response.headers['X-Profile-Id']
+
+        [listed] = self.client.get('/api/admin/profiles').get_json()
+        self.assertEqual((listed['id'], listed['path'], listed['status']), (profile_id, '/api/init', '200 OK'))
+
+        text = self.client.get(f'/api/admin/profiles/{profile_id}?format=text').get_data(as_text=True)
+        self.assertIn('get_init_data', text)
+        raw = self.client.get(f'/api/admin/profiles/{profile_id}')
+        self.assertEqual(raw.mimetype, 'application/octet-stream')
+        self.assertEqual(len(raw.data), listed['size'])
+        raw.close()
+        self.assertEqual(self.client.get('/api/admin/profiles/nope').status_code, 404)
+
+    def test_02_ring_buffer_keeps_the_newest(self):
+        ids = [self.client.get('/api/people?profile=cprofile').headers['X-Profile-Id'] for _ in range(5)]
+        listed = [p['id'] for p in self.client.get('/api/admin/profiles').get_json()]
+        self.assertEqual(listed, ids[:1:-1])
+        self.assertEqual(len(os.listdir(profile_store.directory)), 6)  # capture + meta each
+
+
+class TestOrdering(ApiTestCase):
+    def task_texts(self, category_index=0):
+        cats = self.client.get('/api/init').get_json()['categories']
+        return [t['text'] for t in cats[category_index]['tasks']]
+
+    def test_01_move_writes_one_row(self):
+        self.seed_board(2, tasks_per_category=5)
+        updates = []
+
+        def on_execute(conn, cursor, statement, *args):
+            if statement.startswith('UPDATE task'):
+                updates.append(statement)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', on_execute)
+            try:
+                response = self.client.post('/api/tasks/5/move', json={"before_id": 2})
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', on_execute)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.task_texts(), ["Task 0.0", "Task 0.4", "Task 0.1", "Task 0.2", "Task 0.3"])
+
+        self.client.post('/api/tasks/1/move', json={"after_id": 4})
+        self.assertEqual(self.task_texts(), ["Task 0.4", "Task 0.1", "Task 0.2", "Task 0.3", "Task 0.0"])
+
+        # Across categories, then to the end of the target category
+        self.client.post('/api/tasks/1/move', json={"category_id": 2})
+        self.assertEqual(self.task_texts(1)[-1], "Task 0.0")
+        self.assertEqual(self.client.post('/api/tasks/2/move', json={"before_id": 6, "category_id": 1}).status_code, 400)
+
+        self.client.post('/api/categories/2/move', json={"before_id": 1})
+        cats = self.client.get('/api/init').get_json()['categories']
+        self.assertEqual([c['id'] for c in cats], [2, 1])
+
+    def test_02_exhausted_gaps_are_rebalanced(self):
+        self.seed_board(1, tasks_per_category=3)
+        # Keep splitting the gap right after task 1 until doubles run out
+        for i in range(80):
+            self.client.post(f'/api/tasks/{2 + i % 2}/move', json={"after_id": 1})
+        with app.app_context():
+            orders = [t.order for t in Task.query.order_by(Task.order)]
+            self.assertEqual(len(set(orders)), 3)
+
+            schedule_rebalance(app, Task, 1).join()
+            db.session.expire_all()
+            tasks = Task.query.order_by(Task.order).all()
+            gaps = [b.order - a.order for a, b in zip(tasks, tasks[1:])]
+            self.assertTrue(all(gap > MIN_ORDER_GAP for gap in gaps))
+        self.assertEqual(self.task_texts()[0], "Task 0.0")
+
+    def test_03_rebalance_runs_after_the_move_commits(self):
+        self.seed_board(1, tasks_per_category=4)
+        for attempt in range(5):
+            with app.app_context():
+                for task_id, order in zip((1, 2, 3, 4), (1.0, 1.0000001, 1.0000002, 5.0)):
+                    db.session.get(Task, task_id).order = order
+                db.session.commit()
+            response = self.client.post('/api/tasks/4/move', json={"after_id": 1})
+            self.assertEqual(response.status_code, 200)
+            for thread in threading.enumerate():
+                if thread.name.startswith('rebalance-'):
+                    thread.join()
+
+            with app.app_context():
+                tasks = Task.query.order_by(Task.order).all()
+                self.assertEqual([t.id for t in tasks], [1, 4, 2, 3], attempt)
+                self.assertTrue(all(b.order - a.order > MIN_ORDER_GAP for a, b in zip(tasks, tasks[1:])))
+
+
+class TestBatch(ApiTestCase):
+    def test_01_batch_applies_in_one_commit(self):
+        self.seed_board(1, tasks_per_category=2)
+        commits = []
+        operations = [
+            {"op": "create", "type": "category", "ref": "cat", "data": {"name": "New", "color": "#00f"}},
+            {"op": "create", "type": "task", "ref": "t", "data": {"category_id": "$cat", "text": "Imported"}},
+            {"op": "upsert", "type": "note", "data": {"task_id": "$t", "date": "2025-01-01", "content": "n"}},
+            {"op": "update", "type": "task", "id": 1, "data": {"done": True}},
+            {"op": "update", "type": "task", "id": 2, "data": {"done": True}},
+            {"op": "delete", "type": "person", "id": 3},
+        ]
+
+        def on_commit(conn):
+            commits.append(conn)
+
+        with app.app_context():
+            event.listen(db.engine, 'commit', on_commit)
+            try:
+                response = self.client.post('/api/batch', json={"operations": operations})
+            finally:
+                event.remove(db.engine, 'commit', on_commit)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['results']
+        self.assertEqual(results[1]['category_id'], results[0]['id'])
+        self.assertEqual(results[2]['task_id'], results[1]['id'])
+        self.assertEqual(len(commits), 1)
+
+        cats = self.client.get('/api/init').get_json()['categories']
+        self.assertTrue(all(t['done'] for t in cats[0]['tasks']))
+        self.assertEqual([t['text'] for t in cats[1]['tasks']], ["Imported"])
+
+    def test_02_failed_operation_rolls_back_everything(self):
+        self.seed_board(1)
+        before = self.client.get('/api/backup').get_json()
+        response = self.client.post('/api/batch', json={"operations": [
+            {"op": "update", "type": "task", "id": 1, "data": {"text": "changed"}},
+            {"op": "delete", "type": "task", "id": 999},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['index'], 1)
+        self.assertEqual(self.client.get('/api/backup').get_json(), before)
+        self.assertEqual(self.client.post('/api/batch', json={}).status_code, 400)
+
+    def test_03_refs_only_in_id_fields(self):
+        self.seed_board(1)
+        response = self.client.post('/api/batch', json={"operations": [
+            {"op": "create", "type": "task", "ref": "t", "data": {"category_id": 1, "text": "$200 deposit"}},
+            {"op": "upsert", "type": "note", "data": {"task_id": "$t", "date": "2025-01-01", "content": "$$$"}},
+            {"op": "update", "type": "task", "id": "$t", "data": {"text": "$t"}},
+        ]})
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        results = response.get_json()['results']
+        self.assertEqual((results[1]['content'], results[2]['text']), ("$$$", "$t"))
+
+        response = self.client.post('/api/batch', json={"operations": [
+            {"op": "update", "type": "task", "id": 1, "data": {"text": "ok"}},
+            {"op": "create", "type": "category", "data": {"name": {"nested": 1}, "color": "#000"}},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['index'], 1)
+
+
+class TestBackup(ApiTestCase):
+    def test_01_streamed_json_matches_plain_backup(self):
+        self.seed_board(3)
+        self.client.post('/api/notes', json={"task_id": 1, "date": "2025-01-01", "content": "hi"})
+        plain = self.client.get('/api/backup').get_json()
+
+        streamed = self.client.get('/api/backup?stream=json')
+        self.assertEqual(json.loads(streamed.get_data()), plain)
+
+        compressed = self.client.get('/api/backup?stream=json&gzip=1')
+        self.assertEqual(compressed.mimetype, 'application/gzip')
+        self.assertEqual(json.loads(gzip.decompress(compressed.get_data())), plain)
+
+    def test_02_streamed_ndjson(self):
+        self.seed_board(2, tasks_per_category=2)
+        response = self.client.get('/api/backup?stream=ndjson')
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([l['table'] for l in lines],
+                         ['categories'] * 2 + ['people'] * 3 + ['tasks'] * 4)
+        self.assertEqual(self.client.get('/api/backup?stream=xml').status_code, 400)
+
+    def test_03_restore_roundtrip(self):
+        self.seed_board(3)
+        self.client.post('/api/notes', json={"task_id": 2, "date": "2025-01-01", "content": "hé"})
+        original = self.client.get('/api/backup').get_json()
+
+        for url, body, content_type in (
+            ('/api/restore', json.dumps(original), 'application/json'),
+            ('/api/restore', self.client.get('/api/backup?stream=ndjson').get_data(), 'application/x-ndjson'),
+            ('/api/restore?format=ndjson',
+             self.client.get('/api/backup?stream=ndjson&gzip=1').get_data(), 'application/gzip'),
+        ):
+            self.seed_board(1)  # extra rows the restore must wipe
+            response = self.client.post(url, data=body, content_type=content_type)
+            self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+            self.assertEqual(response.get_json()['restored']['notes'], 1)
+            self.assertEqual(self.client.get('/api/backup').get_json(), original)
+
+        progress = self.client.get('/api/restore/progress').get_json()
+        self.assertEqual(progress['status'], 'done')
+        self.assertEqual(progress['rows']['tasks'], 9)
+
+    def test_04_restore_rejects_dangling_references(self):
+        self.seed_board(1)
+        before = self.client.get('/api/backup').get_json()
+        bad = {'categories': [], 'people': [], 'tasks': [
+            {'id': 1, 'category_id': 99, 'person_id': None, 'text': 'x', 'done': False, 'order': 1}
+        ]}
+        response = self.client.post('/api/restore', json=bad)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('category_id 99', response.get_json()['error'])
+        self.assertEqual(self.client.get('/api/backup').get_json(), before)
+        self.assertEqual(self.client.post('/api/restore', json={}).status_code, 400)
+
+        duplicate = {'categories': [{'id': 1, 'name': 'a', 'color': '#fff'}] * 2}
+        self.assertEqual(self.client.post('/api/restore', json=duplicate).status_code, 400)
+        self.assertEqual(self.client.get('/api/backup').get_json(), before)
+
+    def test_05_json_parser_across_chunk_boundaries(self):
+        class Trickle(io.BytesIO):
+            def read(self, size=-1):
+                return super().read(5)
+
+        doc = {'categories': [{'id': 1, 'name': 'a , ] }', 'color': '#fff'}], 'people': [],
+               'notes': [{'id': 2, 'task_id': 1, 'date': '2025-01-01', 'content': 'ünï "x"'}]}
+        pairs = list(iter_json_backup(Trickle(json.dumps(doc, indent=2).encode('utf-8'))))
+        self.assertEqual(pairs, [('categories', doc['categories'][0]), ('notes', doc['notes'][0])])
+
+
+class TestArchive(ApiTestCase):
+    def finish_tasks(self, ids, done_on):
+        for task_id in ids:
+            self.client.put(f'/api/tasks/{task_id}', json={"done": True})
+        with app.app_context():
+            db.session.execute(db.update(Task).where(Task.id.in_(ids)).values(done_on=done_on))
+            db.session.commit()
+
+    def test_01_done_on_follows_done(self):
+        self.seed_board(1)
+        task = self.client.put('/api/tasks/1', json={"done": True}).get_json()
+        self.assertEqual(task['done_on'], date.today().isoformat())
+        self.assertIsNone(self.client.put('/api/tasks/1', json={"done": False}).get_json()['done_on'])
+
+        # Set on an instance expired by a commit, before `done` is loaded
+        with app.app_context():
+            task = db.session.get(Task, 2)
+            db.session.commit()
+            task.done = True
+            db.session.commit()
+            self.assertEqual(task.done_on, date.today().isoformat())
+
+    def test_02_old_done_tasks_move_to_archive(self):
+        self.seed_board(2, tasks_per_category=3)
+        self.client.post('/api/notes', json={"task_id": 1, "date": "2025-01-01", "content": "old"})
+        self.client.post('/api/notes', json={"task_id": 4, "date": "2025-01-02", "content": "kept"})
+        self.finish_tasks([1, 2], '2020-01-01')
+        self.finish_tasks([3], date.today().isoformat())
+        rev = self.client.get('/api/init').get_json()['rev']
+
+        self.assertEqual(self.client.post('/api/archive/run', json={"days": True}).status_code, 400)
+        response = self.client.post('/api/archive/run', json={"days": 30})
+        self.assertEqual(response.get_json()['archived'], {'tasks': 2, 'notes': 1})
+        # Nothing is due any more
+        self.assertEqual(self.client.post('/api/archive/run').get_json()['archived'],
+                         {'tasks': 0, 'notes': 0})
+
+        init = self.client.get('/api/init').get_json()
+        task_ids = [t['id'] for c in init['categories'] for t in c['tasks']]
+        self.assertEqual(task_ids, [3, 4, 5, 6])
+        changes = self.client.get(f'/api/changes?since={rev}').get_json()
+        self.assertEqual(sorted(changes['deleted']['task']), [1, 2])
+        self.assertEqual(len(changes['deleted']['note']), 1)
+
+        archived = self.client.get('/api/archive?notes=1').get_json()
+        self.assertEqual([(t['task_id'], t['category_name'], t['person_name']) for t in archived],
+                         [(2, 'Cat 0', 'Person 1'), (1, 'Cat 0', 'Person 0')])
+        self.assertEqual([n['content'] for n in archived[1]['notes']], ['old'])
+        self.assertEqual(len(self.client.get('/api/archive?q=0.1').get_json()), 1)
+        self.assertEqual(self.client.get('/api/archive?category_id=2').get_json(), [])
+
+        page = self.client.get('/api/archive?limit=1')
+        self.assertEqual(len(page.get_json()), 1)
+        rest = self.client.get(f"/api/archive?after={page.headers['X-Next-After']}").get_json()
+        self.assertEqual([t['task_id'] for t in rest], [1])
+        self.assertEqual(len(self.client.get('/api/archive?limit=0').get_json()), 1)
+        self.assertEqual(self.client.get('/api/archive?after=bogus').status_code, 400)
+
+    def test_03_archive_is_backed_up(self):
+        self.seed_board(1)
+        self.client.post('/api/notes', json={"task_id": 1, "date": "2025-01-01", "content": "old"})
+        self.finish_tasks([1], '2020-01-01')
+        self.client.post('/api/archive/run')
+        original = self.client.get('/api/backup').get_json()
+        self.assertEqual(len(original['archived_tasks']), 1)
+        self.assertEqual(len(original['archived_notes']), 1)
+
+        body = self.client.get('/api/backup?stream=ndjson').get_data()
+        self.seed_board(1)
+        response = self.client.post('/api/restore', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        self.assertEqual(self.client.get('/api/backup').get_json(), original)
+
+    def test_04_restore_dates_done_tasks_from_old_backups(self):
+        self.seed_board(1)
+        self.client.put('/api/tasks/1', json={"done": True})
+        backup = self.client.get('/api/backup').get_json()
+        for task in backup['tasks']:
+            del task['done_on']
+        response = self.client.post('/api/restore', json=backup)
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+
+        with app.app_context():
+            done_on = dict(db.session.execute(db.select(Task.id, Task.done_on)).all())
+        self.assertEqual(done_on[1], date.today().isoformat())
+        self.assertIsNone(done_on[2])
+        with app.app_context():
+            counts = archive_done_tasks(archive_cutoff(1, today=date.today() + timedelta(days=2)))
+            db.session.commit()
+        self.assertEqual(counts['tasks'], 1)
+
+
+class TestSearch(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seed_board(2, tasks_per_category=2)
+        self.client.put('/api/tasks/1', json={"text": "Renouveler le contrat été"})
+        self.client.put('/api/tasks/3', json={"text": "Appeler le fournisseur"})
+        self.client.post('/api/notes', json={"task_id": 2, "date": "2025-01-01",
+                                             "content": "Le contrat du fournisseur arrive à échéance"})
+
+    def search(self, q, **params):
+        response = self.client.get('/api/search', query_string={'q': q, **params})
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        return response
+
+    def test_01_ranked_hits_with_snippets(self):
+        hits = self.search('contrat').get_json()
+        self.assertEqual(sorted((h['kind'], h['task_id']) for h in hits), [('note', 2), ('task', 1)])
+        self.assertEqual([h['rank'] for h in hits], sorted(h['rank'] for h in hits))
+        note = next(h for h in hits if h['kind'] == 'note')
+        self.assertIn('<mark>contrat</mark>', note['snippet'])
+        self.assertEqual((note['date'], note['category_id']), ("2025-01-01", 1))
+
+        # Accents are folded and the last word matches as a prefix
+        self.assertEqual([h['task_id'] for h in self.search('ETE').get_json()], [1])
+        self.assertEqual(len(self.search('fourn').get_json()), 2)
+        self.assertEqual([h['kind'] for h in self.search('fourn', type='notes').get_json()], ['note'])
+
+        page = self.search('fourn', limit=1)
+        self.assertEqual(page.headers['X-Next-Offset'], '1')
+        rest = self.search('fourn', offset=1).get_json()
+        self.assertEqual(len(rest), 1)
+        self.assertNotEqual(rest[0]['kind'], page.get_json()[0]['kind'])
+        for limit in (0, -1):
+            page = self.search('fourn', limit=limit)
+            self.assertEqual((len(page.get_json()), page.headers['X-Next-Offset']), (1, '1'))
+
+    def test_02_query_syntax_is_neutralised(self):
+        self.assertEqual(self.search('contrat" OR (NEAR * ^').get_json(), [])
+        self.assertEqual(len(self.search('-contrat').get_json()), 2)
+        self.assertEqual(self.client.get('/api/search?q=%22%29').status_code, 400)
+        self.assertEqual(self.client.get('/api/search?q=x&type=people').status_code, 400)
+
+    def test_03_index_follows_writes(self):
+        self.client.put('/api/tasks/1', json={"text": "Classer les factures"})
+        self.client.delete('/api/tasks/2')
+        self.assertEqual(self.search('contrat').get_json(), [])
+        self.assertEqual([h['task_id'] for h in self.search('factures').get_json()], [1])
+
+        backup = self.client.get('/api/backup').get_json()
+        self.client.put('/api/tasks/1', json={"text": "Autre chose"})
+        self.client.post('/api/restore', json=backup)
+        self.assertEqual([h['task_id'] for h in self.search('factures').get_json()], [1])
+        self.assertEqual(self.search('autre').get_json(), [])
+
+    def test_04_rebuild_command(self):
+        with app.app_context():
+            db.session.execute(text("INSERT INTO task_fts(task_fts) VALUES ('delete-all')"))
+            db.session.commit()
+        self.assertEqual(self.search('fournisseur', type='tasks').get_json(), [])
+        result = app.test_cli_runner().invoke(args=['search-index'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual([h['task_id'] for h in self.search('fournisseur', type='tasks').get_json()], [3])
+
+    def test_05_failed_restore_keeps_index_in_sync(self):
+        backup = self.client.get('/api/backup').get_json()
+        backup['tasks'][0]['category_id'] = 99
+        response = self.client.post('/api/restore', json=backup)
+        self.assertEqual(response.status_code, 400)
+
+        with app.app_context():
+            triggers = db.session.execute(text(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger'")).scalar()
+        self.assertEqual(triggers, 6)
+        self.client.put('/api/tasks/3', json={"text": "Relancer le transporteur"})
+        self.assertEqual(self.search('fournisseur', type='tasks').get_json(), [])
+        self.assertEqual([h['task_id'] for h in self.search('transporteur').get_json()], [3])
+
+    def test_06_sqlite_without_fts5_answers_501(self):
+        with app.app_context():
+            self.assertTrue(search_available(db.engine))
+            _fts5_builds[db.engine] = False
+            self.addCleanup(_fts5_builds.clear)
+            db.drop_all()
+            migrate_db()
+            triggers = db.session.execute(text(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger'")).scalar()
+        self.assertEqual(triggers, 0)
+        self.seed_board(1)
+        self.assertEqual(self.client.put('/api/tasks/1', json={"text": "x"}).status_code, 200)
+        self.assertEqual(self.client.get('/api/search?q=x').status_code, 501)
+
+
+class TestPdfExport(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        pdf_cache.clear()
+
+    def export(self, week_start='2025-01-03'):
+        response = self.client.get(f'/api/export-pdf?week_start={week_start}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/pdf')
+        return response
+
+    def test_01_repeat_export_is_cached_until_board_changes(self):
+        self.seed_board(2)
+        first = self.export()
+        self.assertEqual(first.headers['X-PDF-Cache'], 'miss')
+        second = self.export()
+        self.assertEqual(second.headers['X-PDF-Cache'], 'hit')
+        self.assertEqual(first.get_data(), second.get_data())
+
+        self.assertEqual(self.export('2025-01-10').headers['X-PDF-Cache'], 'miss')
+        self.client.put('/api/tasks/1', json={"text": "changed"})
+        self.assertEqual(self.export().headers['X-PDF-Cache'], 'miss')
+
+    def test_02_week_scope_filters_in_sql(self):
+        self.seed_board(2, tasks_per_category=2)
+        self.client.put('/api/tasks/2', json={"done": True})
+        for task_id, day, content in ((1, '2025-01-04', 'in week'), (1, '2024-12-30', 'lookback'),
+                                      (1, '2024-11-01', 'old'), (2, '2025-01-04', 'done task'),
+                                      (3, '2025-01-05', '   ')):
+            self.client.post('/api/notes', json={"task_id": task_id, "date": day, "content": content})
+
+        with app.app_context():
+            sections = collect_pdf_sections('2025-01-03', '2025-01-09')
+            self.assertEqual([s['name'] for s in sections], ["Cat 0", "Cat 1"])
+            self.assertEqual([t['text'] for t in sections[0]['tasks']], ["Task 0.0"])
+            self.assertEqual(sections[0]['tasks'][0]['notes'], [('2025-01-04', 'in week')])
+            self.assertEqual(sections[1]['tasks'][0]['notes'], [])
+
+            notes = collect_pdf_sections('2024-12-27', '2025-01-09')[0]['tasks'][0]['notes']
+            self.assertEqual([c for _, c in notes], ['in week', 'lookback'])
+            self.assertEqual(len(collect_pdf_sections()[0]['tasks'][0]['notes']), 3)
+
+            self.seed_board(40)
+            with QueryCounter(db.engine) as counter:
+                collect_pdf_sections('2025-01-03', '2025-01-09')
+            self.assertEqual(counter.count, 2)
+
+        for query in ('notes=week', 'lookback_days=7', 'notes=all'):
+            self.assertEqual(self.export(f'2025-01-03&{query}').headers['X-PDF-Cache'], 'miss')
+        self.assertEqual(self.client.get('/api/export-pdf?notes=bogus').status_code, 400)
+
+    def test_03_lru_eviction_and_disk_tier(self):
+        cache = PdfCache(max_bytes=10, max_entries=2)
+        cache.put('a', b'1234')
+        cache.put('b', b'1234')
+        cache.get('a')
+        cache.put('c', b'1234')  # over max_entries: evicts b, the least recently used
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'1234')
+        cache.put('d', b'12345678')  # over max_bytes
+        self.assertEqual(list(cache._entries), ['d'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            PdfCache(directory=directory).put('k', b'%PDF')
+            self.assertEqual(PdfCache(directory=directory).get('k'), b'%PDF')
+
+    def test_04_background_job(self):
+        self.seed_board(3)
+        created = self.client.post('/api/export-pdf/jobs', json={'week_start': '2025-01-03'})
+        self.assertEqual(created.status_code, 202)
+        job = created.get_json()
+        duplicate = self.client.post('/api/export-pdf/jobs', json={'week_start': '2025-01-03'}).get_json()
+        self.assertEqual(duplicate['id'], job['id'])
+
+        for _ in range(100):
+            status = self.client.get(job['status_url']).get_json()['status']
+            if status == 'done':
+                break
+            time.sleep(0.05)
+        self.assertEqual(status, 'done')
+
+        result = self.client.get(job['result_url'])
+        self.assertEqual(result.mimetype, 'application/pdf')
+        self.assertEqual(result.get_data(), self.export().get_data())
+        self.assertEqual(self.client.get('/api/export-pdf/jobs/nope').status_code, 404)
+
+        # A cached export is a finished job straight away, without the pool
+        queue = PdfJobQueue(max_workers=1)
+        job = queue.completed('cached-key', b'%PDF cached')
+        self.assertEqual((job.status, job.result), ('done', b'%PDF cached'))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(queue._executor)
+        self.assertIs(queue.completed('cached-key', b'other'), job)
+
+    def test_05_finished_jobs_expire(self):
+        queue = PdfJobQueue(max_workers=1, ttl=0)
+        job = queue.submit('key', bytes, b'%PDF')
+        job.future.result()
+        time.sleep(0.01)
+        self.assertIsNone(queue.get(job.id))
+        self.assertNotEqual(queue.submit('key', bytes, b'%PDF').id, job.id)
+        queue.shutdown()
+
+    def test_06_batch_export(self):
+        self.seed_board(2, tasks_per_category=2, n_people=2)
+        for task_id, day, content in ((1, '2025-01-04', 'week one'), (1, '2025-01-11', 'week two'),
+                                      (2, '2025-01-12', 'other person')):
+            self.client.post('/api/notes', json={"task_id": task_id, "date": day, "content": content})
+
+        with app.app_context(), QueryCounter(db.engine) as counter:
+            documents = collect_pdf_batch(datetime(2025, 1, 3), '2025-01-16', by_person=True)
+        self.assertEqual(counter.count, 2)
+        self.assertEqual([d['name'] for d in documents], ['2025-01-03_Person-0', '2025-01-03_Person-1',
+                                                          '2025-01-10_Person-0', '2025-01-10_Person-1'])
+        notes = [n for d in documents for s in d['sections'] for t in s['tasks'] for _, n in t['notes']]
+        self.assertEqual(notes, ['week one', 'week two', 'other person'])
+        self.assertEqual({t['who'] for s in documents[0]['sections'] for t in s['tasks']}, {'Person 0'})
+
+        app.config['PDF_BATCH_WORKERS'], workers = 2, app.config['PDF_BATCH_WORKERS']
+        self.addCleanup(app.config.__setitem__, 'PDF_BATCH_WORKERS', workers)
+        response = self.client.get('/api/export-pdf/batch?start=2025-01-03&end=2025-01-16&group=person')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+            self.assertEqual(len(archive.namelist()), 4)
+            self.assertTrue(archive.read('2025-01-10_Person-1.pdf').startswith(b'%PDF'))
+        self.assertEqual(self.client.get('/api/export-pdf/batch?start=2025-01-03&end=2025-01-16&group=person')
+                         .headers['X-PDF-Cache'], 'hit')
+
+        combined = self.client.get('/api/export-pdf/batch?start=2025-01-03&end=2025-01-16&format=pdf')
+        self.assertEqual(combined.mimetype, 'application/pdf')
+        self.assertIn(b'/Outlines', combined.get_data())
+
+        for query in ('', 'start=2025-01-10&end=2025-01-03', 'start=2025-01-03&group=team',
+                      'start=2024-01-05&end=2025-01-03'):
+            self.assertEqual(self.client.get(f'/api/export-pdf/batch?{query}').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
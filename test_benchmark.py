@@ -0,0 +1,286 @@
+"""
+Performance checks for SEB OPS SYSTEM v5.
+
+These seed a throwaway SQLite file with a few thousand rows and assert on
+memory bounds and on how much work a path does. The wall-clock comparisons
+(throughput floors, fast path vs. legacy path) depend on the machine and
+its load, so they only run when asked for:
+
+    python -m pytest -q -s test_benchmark.py
+    RUN_BENCHMARKS=1 python -m pytest -q -s test_benchmark.py
+"""
+
+import atexit
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+from datetime import date, timedelta
+
+# Shared by every test module in the process: app binds its engine on import
+_DB_PATH = os.path.join(tempfile.gettempdir(), f'seb_ops_test_{os.getpid()}.db')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + _DB_PATH)
+
+
+@atexit.register
+def _remove_test_db():
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(_DB_PATH)
+
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from app import app, get_init_data
+from json_provider import orjson
+from database import DEFAULTS, engine_options, install_sqlite_pragmas
+from migrations import migrate_db
+from models import db, Category, Person, Task, Note
+
+benchmark = unittest.skipUnless(os.environ.get('RUN_BENCHMARKS') == '1',
+                                'wall-clock benchmark, set RUN_BENCHMARKS=1 to run')
+
+
+def seed_notes(n_notes, n_tasks=100):
+    """Bulk-insert one category, one person, n_tasks tasks and n_notes notes."""
+    db.session.execute(db.insert(Category), [{'id': 1, 'name': 'Bench', 'color': '#000', 'order': 1}])
+    db.session.execute(db.insert(Person), [{'id': 1, 'name': 'Bench'}])
+    db.session.execute(db.insert(Task), [
+        {'id': i, 'category_id': 1, 'person_id': 1, 'text': f'Task {i}', 'done': False, 'order': i}
+        for i in range(1, n_tasks + 1)
+    ])
+    db.session.execute(db.insert(Note), [
+        {'task_id': i % n_tasks + 1,
+         'date': (date(2000, 1, 1) + timedelta(days=i // n_tasks)).isoformat(),
+         'content': f'Note {i} ' + 'x' * 80}
+        for i in range(n_notes)
+    ])
+    db.session.commit()
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            migrate_db()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+class TestBackupStreaming(BenchmarkTestCase):
+    def peak_stream_memory(self, n_notes):
+        with app.app_context():
+            db.drop_all()
+            migrate_db()
+            seed_notes(n_notes)
+        tracemalloc.start()
+        try:
+            response = self.client.get('/api/backup?stream=ndjson')
+            size = sum(len(chunk) for chunk in response.response)
+            response.close()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, size
+
+    def test_01_stream_memory_is_flat(self):
+        small_peak, small_size = self.peak_stream_memory(2000)
+        large_peak, large_size = self.peak_stream_memory(20000)
+        print(f"\nbackup stream peak: {small_peak / 1024:.0f} KiB for {small_size / 1024:.0f} KiB, "
+              f"{large_peak / 1024:.0f} KiB for {large_size / 1024:.0f} KiB")
+        self.assertGreater(large_size, 9 * small_size)
+        self.assertLess(large_peak, 2 * small_peak)
+
+
+class TestRestoreThroughput(BenchmarkTestCase):
+    N_NOTES = 50000
+    MIN_ROWS_PER_SECOND = 10000
+
+    @benchmark
+    def test_01_bulk_restore_throughput(self):
+        with app.app_context():
+            seed_notes(self.N_NOTES)
+        for fmt, content_type in (('json', 'application/json'), ('ndjson', 'application/x-ndjson')):
+            body = self.client.get(f'/api/backup?stream={fmt}').get_data()
+
+            start = time.perf_counter()
+            response = self.client.post('/api/restore', data=body, content_type=content_type)
+            elapsed = time.perf_counter() - start
+
+            self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+            restored = sum(response.get_json()['restored'].values())
+            rate = restored / elapsed
+            print(f"\nrestore {fmt}: {restored} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+            self.assertEqual(response.get_json()['restored']['notes'], self.N_NOTES)
+            self.assertGreater(rate, self.MIN_ROWS_PER_SECOND)
+
+
+class TestSerialization(BenchmarkTestCase):
+    N_CATEGORIES = 100
+    TASKS_PER_CATEGORY = 100
+
+    def seed_board(self):
+        n_tasks = self.N_CATEGORIES * self.TASKS_PER_CATEGORY
+        db.session.execute(db.insert(Category), [
+            {'id': c, 'name': f'Cat {c}', 'color': '#000', 'order': c}
+            for c in range(1, self.N_CATEGORIES + 1)
+        ])
+        db.session.execute(db.insert(Person), [{'id': p, 'name': f'Person {p}'} for p in range(1, 11)])
+        db.session.execute(db.insert(Task), [
+            {'id': i, 'category_id': i % self.N_CATEGORIES + 1, 'person_id': i % 10 + 1,
+             'text': f'Task {i} ' + 'y' * 40, 'done': i % 3 == 0, 'order': i}
+            for i in range(1, n_tasks + 1)
+        ])
+        db.session.commit()
+
+    def legacy_init_body(self):
+        # The pre-row_dicts path: hydrate ORM objects, to_dict(), stdlib json
+        categories = Category.query.order_by(Category.order, Category.id).all()
+        tasks = Task.query.order_by(Task.category_id, Task.order, Task.id).all()
+        people = Person.query.all()
+        tasks_by_category = {}
+        for t in tasks:
+            tasks_by_category.setdefault(t.category_id, []).append(t.to_dict())
+        cats_data = []
+        for cat in categories:
+            c_dict = cat.to_dict()
+            c_dict['tasks'] = tasks_by_category.get(cat.id, [])
+            cats_data.append(c_dict)
+        return json.dumps({'rev': 0, 'categories': cats_data,
+                           'people': [p.to_dict() for p in people]}, sort_keys=True)
+
+    def best_of(self, fn, runs=3):
+        timings = []
+        for _ in range(runs):
+            db.session.expunge_all()
+            start = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+
+    def test_01_row_path_hydrates_no_objects(self):
+        loaded = []
+
+        def on_load(target, context):
+            loaded.append(target)
+
+        with app.app_context():
+            self.seed_board()
+            legacy_body = self.legacy_init_body()
+        with app.test_request_context('/api/init'):
+            for model in (Category, Person, Task):
+                event.listen(model, 'load', on_load)
+                self.addCleanup(event.remove, model, 'load', on_load)
+            fast_body = get_init_data.__wrapped__().get_data()
+        self.assertEqual(loaded, [])
+        self.assertEqual(json.loads(fast_body)['categories'], json.loads(legacy_body)['categories'])
+
+    @benchmark
+    def test_02_row_path_beats_orm_path(self):
+        with app.app_context():
+            self.seed_board()
+            legacy, legacy_body = self.best_of(self.legacy_init_body)
+        with app.test_request_context('/api/init'):
+            fast, response = self.best_of(get_init_data.__wrapped__)
+        print(f"\n/api/init with {self.N_CATEGORIES * self.TASKS_PER_CATEGORY} tasks: "
+              f"ORM + json {legacy * 1000:.0f} ms, rows + {type(app.json).__name__} "
+              f"{fast * 1000:.0f} ms ({'orjson' if orjson else 'stdlib'})")
+        self.assertLess(fast, legacy / 1.5)
+
+
+class TestBenchSuite(BenchmarkTestCase):
+    def test_01_tiny_run_reports_every_endpoint(self):
+        import bench
+        self.addCleanup(app.config.__setitem__, 'METRICS_SLOW_REQUEST_MS', app.config['METRICS_SLOW_REQUEST_MS'])
+        report = bench.run(['tiny'], requests=3, heavy_requests=1, cold_starts=1, log=lambda msg: None)
+        endpoints = report['sizes']['tiny']['endpoints']
+        self.assertEqual(set(endpoints), {'init', 'notes_week', 'upsert_note', 'backup_ndjson',
+                                          'restore_ndjson', 'export_pdf', 'export_pdf_cached'})
+        self.assertEqual(endpoints['init']['n'], 3)
+        self.assertLessEqual(endpoints['init']['p50_ms'], endpoints['init']['max_ms'])
+        self.assertGreater(endpoints['restore_ndjson']['rows'], 200)
+        self.assertIn('sqlite', report['environment'])
+        # Workers start without ReportLab; the first export loads it
+        self.assertFalse(report['cold_start']['reportlab_loaded'])
+
+
+class TestSqliteConcurrency(unittest.TestCase):
+    DURATION = 1.5
+    READERS = 4
+    WRITERS = 2
+
+    def run_workload(self, **overrides):
+        """Readers and writers hammering one file for DURATION; returns op counts."""
+        settings = {**DEFAULTS, **overrides}
+        with tempfile.TemporaryDirectory() as directory:
+            settings['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+            engine = create_engine(settings['DATABASE_URL'], **engine_options(settings))
+            install_sqlite_pragmas(engine, settings)
+            with engine.begin() as conn:
+                conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, body TEXT)"))
+                conn.execute(text("INSERT INTO item (body) VALUES (:b)"), [{'b': 'x' * 100}] * 2000)
+
+            stop = time.perf_counter() + self.DURATION
+            results = []
+
+            def reader():
+                ops = errors = 0
+                while time.perf_counter() < stop:
+                    try:
+                        with engine.connect() as conn:
+                            conn.execute(text("SELECT count(*), max(length(body)) FROM item")).one()
+                        ops += 1
+                    except OperationalError:
+                        errors += 1
+                results.append(('reads', ops, errors))
+
+            def writer():
+                ops = errors = 0
+                while time.perf_counter() < stop:
+                    try:
+                        with engine.begin() as conn:
+                            conn.execute(text("INSERT INTO item (body) VALUES (:b)"), {'b': 'y' * 100})
+                        ops += 1
+                    except OperationalError:
+                        errors += 1
+                results.append(('writes', ops, errors))
+
+            threads = [threading.Thread(target=reader) for _ in range(self.READERS)]
+            threads += [threading.Thread(target=writer) for _ in range(self.WRITERS)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            engine.dispose()
+
+        totals = {'reads': 0, 'writes': 0, 'errors': 0}
+        for kind, ops, errors in results:
+            totals[kind] += ops
+            totals['errors'] += errors
+        return totals
+
+    @benchmark
+    def test_01_wal_throughput(self):
+        # What app.py used before database.py: rollback journal, FULL sync, no busy wait
+        legacy = self.run_workload(SQLITE_JOURNAL_MODE='DELETE', SQLITE_SYNCHRONOUS='FULL',
+                                   SQLITE_CACHE_SIZE=-2000, SQLITE_MMAP_SIZE=0,
+                                   SQLITE_BUSY_TIMEOUT_MS=0)
+        tuned = self.run_workload()
+        for name, r in (('legacy', legacy), ('tuned', tuned)):
+            print(f"\n{name}: {r['reads'] / self.DURATION:,.0f} reads/s, "
+                  f"{r['writes'] / self.DURATION:,.0f} writes/s, {r['errors']} lock errors")
+        self.assertEqual(tuned['errors'], 0)
+        self.assertGreater(tuned['reads'] + tuned['writes'], legacy['reads'] + legacy['writes'])
+
+
+if __name__ == '__main__':
+    unittest.main()